@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线端到端基准测试
+启动本地模拟上游，用 N 个虚拟账号运行 main.main()，报告耗时、请求数和内存峰值
+
+用法 (在仓库根目录):
+    python -m bench.benchmark --accounts 20 --latency 0.05 --error-rate 0.02
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench.stubs import build_upstreams
+
+
+def configure(upstreams: dict, accounts: int, cache_dir: str, rate_limit: bool):
+    """把各模块的上游地址、账号和缓存目录指向本地环境"""
+    import main
+    from tasks import miyoushe, weather, bangumi, conference
+    from utils import client, ledger, metrics, outbox, push, ratelimit, retry, store
+
+    mihoyo = upstreams["mihoyo"].base_url
+    miyoushe.ROLE_URL = f"{mihoyo}/binding/api/getUserGameRolesByCookie"
+    miyoushe.API_URLS = {
+        api_type: {action: url.replace("https://api-takumi.mihoyo.com", mihoyo) for action, url in urls.items()}
+        for api_type, urls in miyoushe.API_URLS.items()
+    }
+    miyoushe.COOKIE = ""
+    miyoushe.COOKIE_FILE = ""
+    miyoushe.COOKIES_STR = "\n".join(
+        f"ltuid={100000 + i}; ltoken=bench{i}; cookie_token=bench{i}" for i in range(accounts)
+    )
+
+    weather_url = upstreams["weather"].base_url
+    weather.FORECAST_2H_URL = f"{weather_url}/v1/environment/2-hour-weather-forecast"
+    weather.FORECAST_24H_URL = f"{weather_url}/v1/environment/24-hour-weather-forecast"
+    bangumi.CALENDAR_URL = f"{upstreams['bangumi'].base_url}/calendar"
+    bangumi.SUBJECT_URL = f"{upstreams['bangumi'].base_url}/v0/subjects/{{subject_id}}"
+    bangumi.EPISODES_URL = f"{upstreams['bangumi'].base_url}/v0/episodes"
+    conference.CONF_URL = f"{upstreams['github'].base_url}/conferences.yml"
+
+    push.TELEGRAM_API = upstreams["telegram"].base_url
+    push.TELEGRAM_BOT_TOKEN = "bench:token"
+    push.TELEGRAM_CHAT_ID = "1"
+    push.WECOM_WEBHOOK = f"{upstreams['wecom'].base_url}/webhook?key=bench"
+    push.PUSHPLUS_URL = f"{upstreams['pushplus'].base_url}/send"
+    push.PUSHPLUS_TOKEN = "bench"
+
+    # 米游社限流规则改写到模拟服务，其余主机不限流
+    mihoyo_host = mihoyo.split("://", 1)[1]
+    if rate_limit:
+        ratelimit.LIMITS = {
+            key.replace("api-takumi.mihoyo.com", mihoyo_host): value
+            for key, value in ratelimit.DEFAULT_LIMITS.items()
+        }
+    else:
+        ratelimit.LIMITS = {}
+        ratelimit.DEFAULT_RATE = 1e9
+        ratelimit.DEFAULT_BURST = 10 ** 9
+
+    # 每次运行前清空进程内状态
+    store.CACHE_DIR = cache_dir
+    metrics.METRICS_DIR = ""
+    metrics.reset()
+    ledger.close()
+    outbox.close()
+    client.close()
+    ratelimit._buckets.clear()
+    retry._breakers.clear()
+    return main
+
+
+def run_once(args, cache_dir: str) -> dict:
+    """启动模拟上游并运行一次 main.main()"""
+    upstreams = build_upstreams(args.latency, args.error_rate, args.conferences, args.calendar_items)
+    for upstream in upstreams.values():
+        upstream.start()
+
+    try:
+        main = configure(upstreams, args.accounts, cache_dir, not args.no_rate_limit)
+        output = io.StringIO()
+        tracemalloc.start()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+            main.main()
+        wall = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        for upstream in upstreams.values():
+            upstream.stop()
+
+    return {
+        "wall_time": round(wall, 3),
+        "requests": sum(upstream.total for upstream in upstreams.values()),
+        "requests_by_upstream": {name: upstream.total for name, upstream in upstreams.items()},
+        "peak_traced_memory_kb": round(peak / 1024, 1),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线端到端基准测试")
+    parser.add_argument("--accounts", type=int, default=10, help="虚拟账号数")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟上游每个请求的延迟 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟上游返回 503 的概率")
+    parser.add_argument("--conferences", type=int, default=300, help="conferences.yml 中的会议数")
+    parser.add_argument("--calendar-items", type=int, default=30, help="放送表每天的番剧数")
+    parser.add_argument("--runs", type=int, default=1, help="运行次数")
+    parser.add_argument("--warm", action="store_true", help="多次运行共用缓存目录 (测量缓存命中后的表现)")
+    parser.add_argument("--no-rate-limit", action="store_true", help="关闭米游社限流规则")
+    parser.add_argument("--verbose", action="store_true", help="显示任务输出")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    results = []
+    shared_cache = tempfile.mkdtemp(prefix="bench-cache-") if args.warm else None
+    try:
+        for index in range(args.runs):
+            cache_dir = shared_cache or tempfile.mkdtemp(prefix="bench-cache-")
+            try:
+                result = run_once(args, cache_dir)
+            finally:
+                if not shared_cache:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+            results.append(result)
+            print(f"run {index + 1}: wall={result['wall_time']}s requests={result['requests']} "
+                  f"peak={result['peak_traced_memory_kb']}KB {result['requests_by_upstream']}")
+    finally:
+        if shared_cache:
+            shutil.rmtree(shared_cache, ignore_errors=True)
+
+    report = {"params": vars(args), "runs": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
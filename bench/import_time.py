@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冷启动导入耗时测量
+在新的解释器中用 -X importtime 导入 main 和所选任务，统计总导入耗时；
+超过阈值时以非零状态退出，用于发现启动耗时回退
+
+用法 (在仓库根目录):
+    python -m bench.import_time --tasks miyoushe --max-ms 400
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# -X importtime 输出: "import time: self [us] | cumulative | imported package"
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(selection: str) -> dict:
+    """
+    在子进程中导入 main 并加载所选任务
+
+    Returns:
+        {"total_ms": 总耗时, "modules": 导入的模块数, "top": [(模块, 累计毫秒), ...]}
+    """
+    code = (
+        "import main\n"
+        "from tasks import load_task\n"
+        f"for name in main.parse_task_names({selection!r}):\n"
+        "    load_task(name)\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+
+    total_us = 0
+    modules = 0
+    top = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        total_us += int(self_us)
+        modules += 1
+        # 顶层导入 (缩进最小) 的累计耗时
+        if len(indent) == 1:
+            top.append((name, int(cumulative_us) / 1000))
+
+    top.sort(key=lambda x: x[1], reverse=True)
+    return {"total_ms": round(total_us / 1000, 1), "modules": modules, "top": top[:10]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动导入耗时测量")
+    parser.add_argument("--tasks", default="", help="要加载的任务 (逗号分隔，默认全部)")
+    parser.add_argument("--max-ms", type=float, default=0, help="总导入耗时上限 (毫秒)，0 表示不检查")
+    args = parser.parse_args()
+
+    result = measure(args.tasks)
+    print(f"tasks={args.tasks or 'all'} total={result['total_ms']}ms modules={result['modules']}")
+    for name, ms in result["top"]:
+        print(f"  {name:<40} {ms:8.1f}ms")
+
+    if args.max_ms and result["total_ms"] > args.max_ms:
+        print(f"导入耗时超过上限 {args.max_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
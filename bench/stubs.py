@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地上游模拟服务
+每个上游主机 (米游社、data.gov.sg、Bangumi、GitHub Raw、推送渠道) 各起一个 HTTP 服务，
+支持配置延迟和错误率，并统计请求次数
+"""
+
+import json
+import hashlib
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+GAME_BIZ = ["hkrpg_cn", "hk4e_cn", "bh3_cn", "nap_cn"]
+
+WEATHER_AREAS = [
+    ("Ang Mo Kio", 1.375, 103.839), ("Bedok", 1.321, 103.924), ("Bukit Timah", 1.325, 103.791),
+    ("Clementi", 1.315, 103.76), ("Jurong East", 1.326, 103.737), ("Orchard", 1.306, 103.831),
+    ("Pasir Ris", 1.37, 103.949), ("Queenstown", 1.291, 103.786), ("Tampines", 1.345, 103.944),
+    ("Woodlands", 1.432, 103.786),
+]
+
+
+def make_roles(cookie: str) -> list:
+    """按 Cookie 中的 ltuid 生成每个游戏一个角色"""
+    uid = "0"
+    for item in cookie.split(";"):
+        key, _, value = item.strip().partition("=")
+        if key == "ltuid":
+            uid = value
+    return [
+        {"game_biz": biz, "game_uid": f"{index}{uid.zfill(8)}", "region": f"{biz}_region", "nickname": f"user{uid}"}
+        for index, biz in enumerate(GAME_BIZ, 1)
+    ]
+
+
+def make_calendar(items_per_day: int = 30) -> list:
+    """生成一周放送表"""
+    return [
+        {
+            "weekday": {"id": day},
+            "items": [
+                {
+                    "id": day * 1000 + i,
+                    "name": f"Anime {day}-{i}",
+                    "name_cn": f"番剧 {day}-{i}",
+                    "rating": {"score": round(5 + (i % 50) / 10, 1)},
+                    "air_date": "2026-10-01",
+                }
+                for i in range(items_per_day)
+            ],
+        }
+        for day in range(1, 8)
+    ]
+
+
+def make_subject(subject_id: int) -> dict:
+    """生成番剧详情"""
+    return {
+        "id": subject_id,
+        "total_episodes": 12,
+        "infobox": [{"key": "放送时间", "value": "23:30"}],
+    }
+
+
+def make_episodes(subject_id: int, offset: int = 0, limit: int = 100) -> dict:
+    """生成每周一话的章节列表 (ID 为 10 的倍数时是长篇番剧)，支持分页"""
+    count = 1100 if subject_id % 10 == 0 else 12
+    start = datetime.now() - timedelta(weeks=count - 8)
+    return {
+        "data": [
+            {"ep": ep, "sort": ep, "airdate": (start + timedelta(weeks=ep - 1)).strftime("%Y-%m-%d")}
+            for ep in range(offset + 1, min(count, offset + limit) + 1)
+        ],
+        "total": count,
+        "limit": limit,
+        "offset": offset,
+    }
+
+
+def make_conferences_yaml(count: int = 300) -> str:
+    """生成 conferences.yml"""
+    now = datetime.now()
+    tags = ["SEC", "CRYPTO", "PRIV", "CONF", "TOP4"]
+    lines = []
+    for i in range(count):
+        first = (now + timedelta(days=i % 90 - 30, hours=i)).strftime("%Y-%m-%d 23:59")
+        second = (now + timedelta(days=i % 120)).strftime("%Y-%m-%d 23:59")
+        lines += [
+            f"- name: CONF{i}",
+            f"  description: Synthetic Conference {i}",
+            f"  year: {now.year}",
+            f"  link: https://example.org/conf{i}",
+            f"  deadline: [\"{first}\", \"{second}\"]",
+            f"  date: {now.year}-12-01",
+            f"  place: City {i}",
+            f"  tags: [{tags[i % len(tags)]}, {tags[(i + 2) % len(tags)]}]",
+        ]
+        if i % 3 == 0:
+            lines.append("  comment: \"Mandatory abstract registration one week before\"")
+    return "\n".join(lines) + "\n"
+
+
+def make_2h_forecast() -> dict:
+    return {
+        "area_metadata": [
+            {"name": name, "label_location": {"latitude": lat, "longitude": lon}}
+            for name, lat, lon in WEATHER_AREAS
+        ],
+        "items": [{
+            "valid_period": {"start": datetime.now().isoformat()},
+            "forecasts": [{"area": name, "forecast": "Partly Cloudy"} for name, _, _ in WEATHER_AREAS],
+        }],
+    }
+
+
+def make_24h_forecast() -> dict:
+    return {
+        "items": [{
+            "general": {
+                "forecast": "Thundery Showers",
+                "temperature": {"low": 25, "high": 33},
+                "relative_humidity": {"low": 60, "high": 95},
+            },
+            "periods": [],
+        }],
+    }
+
+
+class StubServer:
+    """单个上游主机的模拟服务"""
+
+    def __init__(self, name: str, routes: dict, latency: float = 0.0, error_rate: float = 0.0):
+        """
+        Args:
+            name: 上游名称
+            routes: {路径前缀: 处理函数(method, query, body, headers) -> (状态码, 正文)}
+            latency: 每个请求的附加延迟 (秒)
+            error_rate: 返回 503 的概率
+        """
+        self.name = name
+        self.routes = routes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self, method):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+
+                with stub.lock:
+                    stub.counts[parts.path] = stub.counts.get(parts.path, 0) + 1
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                if random.random() < stub.error_rate:
+                    status, payload = 503, "Service Unavailable"
+                else:
+                    status, payload = 404, "Not Found"
+                    for prefix, handler in stub.routes.items():
+                        if parts.path.startswith(prefix):
+                            status, payload = handler(method, parse_qs(parts.query), body, self.headers)
+                            break
+
+                if isinstance(payload, (dict, list)):
+                    data = json.dumps(payload).encode()
+                    content_type = "application/json"
+                else:
+                    data = payload.encode()
+                    content_type = "text/plain; charset=utf-8"
+
+                # GET 响应带 ETag，支持条件请求
+                etag = ""
+                if method == "GET" and status == 200:
+                    etag = '"' + hashlib.md5(data).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        status, data = 304, b""
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        return Handler
+
+
+def build_upstreams(latency: float = 0.0, error_rate: float = 0.0,
+                    conferences: int = 300, calendar_items: int = 30) -> dict:
+    """创建所有上游模拟服务 (未启动)"""
+    calendar = make_calendar(calendar_items)
+    conferences_yaml = make_conferences_yaml(conferences)
+
+    def ok(payload):
+        return lambda method, query, body, headers: (200, payload)
+
+    def roles(method, query, body, headers):
+        return 200, {"retcode": 0, "data": {"list": make_roles(headers.get("Cookie", ""))}}
+
+    def luna_info(method, query, body, headers):
+        return 200, {"retcode": 0, "data": {"is_sign": False, "total_sign_day": 10}}
+
+    def luna_sign(method, query, body, headers):
+        return 200, {"retcode": 0, "message": "OK", "data": {"code": "ok", "risk_code": 0}}
+
+    def subject(method, query, body, headers):
+        return 200, make_subject(0)
+
+    def episodes(method, query, body, headers):
+        return 200, make_episodes(
+            int(query.get("subject_id", ["0"])[0]),
+            int(query.get("offset", ["0"])[0]),
+            int(query.get("limit", ["100"])[0]),
+        )
+
+    def stub(name, routes):
+        return StubServer(name, routes, latency, error_rate)
+
+    return {
+        "mihoyo": stub("mihoyo", {
+            "/binding/api/getUserGameRolesByCookie": roles,
+            "/event/luna/info": luna_info,
+            "/event/luna/sign": luna_sign,
+            "/event/bbs_sign_reward/info": luna_info,
+            "/event/bbs_sign_reward/sign": luna_sign,
+        }),
+        "weather": stub("weather", {
+            "/v1/environment/2-hour-weather-forecast": ok(make_2h_forecast()),
+            "/v1/environment/24-hour-weather-forecast": ok(make_24h_forecast()),
+        }),
+        "bangumi": stub("bangumi", {
+            "/calendar": ok(calendar),
+            "/v0/subjects/": subject,
+            "/v0/episodes": episodes,
+        }),
+        "github": stub("github", {
+            "/conferences.yml": ok(conferences_yaml),
+        }),
+        "telegram": stub("telegram", {
+            "/bot": ok({"ok": True, "result": {}}),
+        }),
+        "wecom": stub("wecom", {
+            "/webhook": ok({"errcode": 0, "errmsg": "ok"}),
+        }),
+        "pushplus": stub("pushplus", {
+            "/send": ok({"code": 200, "msg": "ok"}),
+        }),
+    }
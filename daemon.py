@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻模式
+按 cron 表达式在进程内调度任务，连接池和内存缓存在多次运行之间保持；
+提供本地健康检查/指标接口。SIGHUP 重新加载配置，SIGTERM/SIGINT 等当前运行结束后退出
+
+用法:
+    DAEMON_SCHEDULE="miyoushe=5 0 * * *; weather=@hourly" python daemon.py
+"""
+
+import os
+import sys
+import json
+import signal
+import threading
+import importlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import main
+from tasks import parse_task_names
+from utils import client, cron, ledger, metrics, outbox
+
+# 任务计划: "任务名[,任务名]=cron 表达式"，多条用分号分隔
+DEFAULT_SCHEDULE = "miyoushe,weather,bangumi,conference=0 8 * * *"
+
+# 健康检查/指标接口监听地址 (host:port)，为空则不启动
+HTTP_ADDR = os.environ.get("DAEMON_HTTP_ADDR", "127.0.0.1:9464")
+
+# SIGHUP 时重新读取的环境变量文件 (每行 KEY=VALUE，# 开头为注释)
+ENV_FILE = os.environ.get("DAEMON_ENV_FILE", "")
+
+# 重新加载配置时一并重新导入的模块 (只含模块级配置，不含连接池等运行状态)
+RELOAD_MODULES = ("utils.push", "main")
+
+_wakeup = threading.Event()
+_stopping = False
+_reload_requested = False
+
+# 供健康检查接口读取
+_state = {
+    "started_at": datetime.now().isoformat(timespec="seconds"),
+    "running": None,
+    "last_run": None,
+    "next_runs": {},
+    "metrics": "",
+}
+_state_lock = threading.Lock()
+
+
+def read_env_file(path: str) -> dict:
+    """
+    读取环境变量文件 (每行 KEY=VALUE)
+
+    Raises:
+        OSError: 文件无法读取
+    """
+    env = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, _, value = line.partition("=")
+            env[key.strip()] = value.strip().strip('"').strip("'")
+    return env
+
+
+def load_schedule(text: str = None) -> dict:
+    """
+    解析任务计划 (默认读取 DAEMON_SCHEDULE)，返回 {任务名: CronExpr}，忽略未知任务
+
+    Raises:
+        cron.CronError: 表达式无效或永远不会匹配 (如 2 月 31 日)
+    """
+    if text is None:
+        text = os.environ.get("DAEMON_SCHEDULE", "")
+    schedule = cron.parse_schedule(text or DEFAULT_SCHEDULE)
+    known = set(parse_task_names(",".join(schedule)))
+    schedule = {name: expr for name, expr in schedule.items() if name in known}
+    now = datetime.now()
+    for expr in set(schedule.values()):
+        expr.next_after(now)
+    return schedule
+
+
+def _reload_modules():
+    for name in [m for m in sys.modules if m.startswith("tasks.")] + list(RELOAD_MODULES):
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+
+
+def reload_config() -> dict:
+    """
+    重新加载配置：读取环境变量文件，重新导入已加载的任务模块和推送配置
+
+    先解析环境变量文件和新的任务计划，通过后才写入 os.environ 并重新导入模块；
+    导入时出错 (如配置值无效) 则恢复原环境变量和模块配置后抛出异常。
+    utils 中的 HTTP、限流、重试等设置在启动时读取，修改后需重启进程
+
+    Raises:
+        Exception: 配置无效，原配置保持不变
+    """
+    env = read_env_file(ENV_FILE) if ENV_FILE else {}
+    schedule = load_schedule(env.get("DAEMON_SCHEDULE", os.environ.get("DAEMON_SCHEDULE", "")))
+
+    previous = dict(os.environ)
+    os.environ.update(env)
+    try:
+        _reload_modules()
+    except Exception:
+        os.environ.clear()
+        os.environ.update(previous)
+        _reload_modules()
+        raise
+
+    print(f"配置已重新加载: {format_schedule(schedule)}")
+    return schedule
+
+
+def format_schedule(schedule: dict) -> str:
+    return "; ".join(f"{name}={expr.expr}" for name, expr in schedule.items())
+
+
+def run_due(names: list):
+    """运行到期的任务 (同一分钟到期的任务合并成一份报告)"""
+    with _state_lock:
+        _state["running"] = names
+    started = datetime.now()
+    status = "ok"
+    metrics.reset()
+    try:
+        main.main(",".join(names))
+    except Exception as e:
+        status = f"error: {e}"
+        print(f"运行异常: {e}")
+    finally:
+        with _state_lock:
+            _state["running"] = None
+            _state["last_run"] = {
+                "tasks": names,
+                "started_at": started.isoformat(timespec="seconds"),
+                "duration": round((datetime.now() - started).total_seconds(), 3),
+                "status": status,
+            }
+            _state["metrics"] = metrics.format_prometheus(metrics.snapshot())
+
+
+def _make_handler():
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: str, content_type: str):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            with _state_lock:
+                state = dict(_state)
+            if self.path == "/healthz":
+                body = {key: value for key, value in state.items() if key != "metrics"}
+                body["status"] = "stopping" if _stopping else "ok"
+                self._send(200, json.dumps(body, ensure_ascii=False), "application/json")
+            elif self.path == "/metrics":
+                self._send(200, state["metrics"], "text/plain; version=0.0.4")
+            else:
+                self._send(404, "Not Found", "text/plain")
+
+    return Handler
+
+
+def start_http_server(addr: str):
+    """在后台线程启动健康检查/指标接口"""
+    host, _, port = addr.rpartition(":")
+    server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _make_handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"健康检查接口: http://{addr}/healthz")
+    return server
+
+
+def _handle_stop(signum, frame):
+    global _stopping
+    print(f"收到信号 {signal.Signals(signum).name}，当前运行结束后退出")
+    _stopping = True
+    _wakeup.set()
+
+
+def _handle_reload(signum, frame):
+    global _reload_requested
+    _reload_requested = True
+    _wakeup.set()
+
+
+def serve():
+    """调度循环"""
+    global _reload_requested
+
+    signal.signal(signal.SIGTERM, _handle_stop)
+    signal.signal(signal.SIGINT, _handle_stop)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _handle_reload)
+
+    schedule = load_schedule()
+    print(f"常驻模式启动: {format_schedule(schedule)}")
+    server = start_http_server(HTTP_ADDR) if HTTP_ADDR else None
+
+    try:
+        while not _stopping:
+            if _reload_requested:
+                _reload_requested = False
+                try:
+                    schedule = reload_config()
+                except Exception as e:
+                    print(f"重新加载配置失败，继续使用原配置: {type(e).__name__}: {e}")
+
+            now = datetime.now()
+            next_runs = {name: expr.next_after(now) for name, expr in schedule.items()}
+            with _state_lock:
+                _state["next_runs"] = {name: t.isoformat() for name, t in next_runs.items()}
+            if not next_runs:
+                print("没有可调度的任务")
+                _wakeup.wait()
+                _wakeup.clear()
+                continue
+
+            due_at = min(next_runs.values())
+            # 被信号唤醒时重新检查状态
+            if _wakeup.wait(max(0, (due_at - datetime.now()).total_seconds())):
+                _wakeup.clear()
+                continue
+
+            # 运行超过一个周期时，错过的时间点不补跑
+            run_due([name for name, t in next_runs.items() if t == due_at])
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        client.close()
+        ledger.close()
+        outbox.close()
+        print("常驻模式已退出")
+
+
+if __name__ == "__main__":
+    serve()
@@ -8,78 +8,170 @@
 """
 
 import os
-from tasks import miyoushe, weather, bangumi, conference
-from utils.push import push_wechat
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from tasks import get_task_title, load_task, parse_task_names
+from utils import metrics, outbox
+from utils.model import Section, Status, as_section
 
+# 每个任务的时间预算 (秒)，可用 TASK_TIMEOUT_<任务名> 单独覆盖
+DEFAULT_TASK_TIMEOUT = float(os.environ.get("TASK_TIMEOUT", "300"))
 
-def main():
+# 要运行的任务 (逗号分隔，为空则运行全部)，命令行参数优先
+TASKS = os.environ.get("TASKS", "")
+
+
+def get_task_timeout(name: str) -> float:
+    """读取任务的时间预算"""
+    return float(os.environ.get(f"TASK_TIMEOUT_{name.upper()}", DEFAULT_TASK_TIMEOUT))
+
+
+def build_section(name: str, title: str, status: str, result) -> Section:
+    """
+    生成单个任务的报告段落
+
+    Args:
+        name: 任务名
+        title: 报告标题
+        status: ok / error / timeout
+        result: 任务返回的 Section (或旧式字符串/列表)、异常信息或超时预算
+    """
+    if status == Status.OK:
+        section = as_section(result)
+    else:
+        detail = result if status == Status.TIMEOUT else str(result)
+        section = Section(status=Status(status, detail))
+    section.key = name
+    section.title = title
+    return section
+
+
+def timed(name: str, func):
+    """包装任务函数，记录其耗时"""
+    def wrapper():
+        started = time.monotonic()
+        status = "error"
+        try:
+            result = func()
+            status = "ok"
+            return result
+        finally:
+            metrics.record_task(name, time.monotonic() - started, status)
+    return wrapper
+
+
+def select_tasks(selection: str = "") -> list:
+    """
+    按名称选择任务，模块在任务执行时才导入
+
+    Returns:
+        [(名称, 报告标题, 执行函数), ...]
+    """
+    return [
+        (name, get_task_title(name), lambda name=name: load_task(name)())
+        for name in parse_task_names(selection)
+    ]
+
+
+def run_tasks(tasks: list) -> list:
+    """
+    并发执行任务，每个任务有独立的时间预算
+
+    Returns:
+        [(名称, 标题, 状态, 结果), ...]，顺序与 tasks 一致
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, len(tasks)))
+    started = time.monotonic()
+    futures = [(name, title, executor.submit(timed(name, func))) for name, title, func in tasks]
+
+    outcomes = []
+    for name, title, future in futures:
+        budget = get_task_timeout(name)
+        remaining = max(0, budget - (time.monotonic() - started))
+        try:
+            outcomes.append((name, title, Status.OK, future.result(timeout=remaining)))
+        except FutureTimeoutError:
+            print(f"{title}执行超时 ({budget:.0f}s)")
+            metrics.record_task(name, budget, Status.TIMEOUT)
+            outcomes.append((name, title, Status.TIMEOUT, budget))
+        except Exception as e:
+            print(f"{title}异常: {e}")
+            outcomes.append((name, title, Status.ERROR, e))
+
+    # 超时的任务线程无法强制结束，不等待它们
+    executor.shutdown(wait=False, cancel_futures=True)
+    return outcomes
+
+
+def start_drain():
+    """有未送达的报告时，在后台线程补发，不阻塞本次任务"""
+    if not outbox.has_pending():
+        return None
+    from utils.push import drain_outbox
+
+    thread = threading.Thread(target=timed("outbox_drain", drain_outbox), daemon=True)
+    thread.start()
+    return thread
+
+
+def drain():
+    """只补发 outbox 中未送达的报告"""
+    from utils.push import drain_outbox
+
+    delivered = timed("outbox_drain", drain_outbox)()
+    print(f"补发完成: {delivered} 条")
+    metrics.write()
+
+
+def main(selection: str = None):
+    """
+    Args:
+        selection: 要运行的任务 (逗号分隔)，默认使用环境变量 TASKS，为空则运行全部
+    """
     print("=" * 60)
     print("每日任务开始")
     print("=" * 60)
 
-    all_messages = []
-
-    # 1. 米游社签到
-    try:
-        miyoushe_results = miyoushe.run()
-        if miyoushe_results:
-            all_messages.append("<b>【米游社签到】</b>")
-            all_messages.extend(miyoushe_results)
-            all_messages.append("")
-    except Exception as e:
-        print(f"米游社签到异常: {e}")
-        all_messages.append(f"<b>【米游社签到】</b>")
-        all_messages.append(f"执行异常: {e}")
-        all_messages.append("")
-
-    # 2. 天气推送
-    try:
-        weather_msg = weather.run()
-        if weather_msg:
-            all_messages.append("<b>【今日天气】</b>")
-            all_messages.append(weather_msg)
-            all_messages.append("")
-    except Exception as e:
-        print(f"天气推送异常: {e}")
-        all_messages.append(f"<b>【今日天气】</b>")
-        all_messages.append(f"执行异常: {e}")
-        all_messages.append("")
-
-    # 3. 番剧更新
-    try:
-        bangumi_msg = bangumi.run()
-        if bangumi_msg:
-            all_messages.append("<b>【番剧更新】</b>")
-            all_messages.append(bangumi_msg)
-            all_messages.append("")
-    except Exception as e:
-        print(f"番剧更新异常: {e}")
-        all_messages.append(f"<b>【番剧更新】</b>")
-        all_messages.append(f"执行异常: {e}")
-        all_messages.append("")
-
-    # 4. 会议截止日期
-    try:
-        conf_msg = conference.run()
-        if conf_msg:
-            all_messages.append("<b>【会议DDL】</b>")
-            all_messages.append(conf_msg)
-            all_messages.append("")
-    except Exception as e:
-        print(f"会议DDL异常: {e}")
-        all_messages.append(f"<b>【会议DDL】</b>")
-        all_messages.append(f"执行异常: {e}")
-        all_messages.append("")
-
-    # 推送汇总消息
-    if all_messages:
-        summary = "<br>".join(all_messages)
-        push_wechat("每日任务报告", summary)
+    drain_thread = start_drain()
+
+    sections = []
+    tasks = select_tasks(TASKS if selection is None else selection)
+    for name, title, status, result in run_tasks(tasks):
+        section = build_section(name, title, status, result)
+        if section.metrics:
+            metrics.record_values(name, {metric.name: metric.value for metric in section.metrics})
+        if not section.empty:
+            sections.append(section)
+
+    # 推送汇总报告 (先写入 outbox，失败的渠道下次运行时补发)
+    if sections:
+        from utils.push import deliver
+
+        timed("push", lambda: deliver("每日任务报告", sections))()
+
+    if drain_thread is not None:
+        drain_thread.join(timeout=get_task_timeout("push"))
+
+    metrics.write()
 
     print("=" * 60)
     print("每日任务完成")
     print("=" * 60)
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="每日任务")
+    parser.add_argument("tasks", nargs="*", help="要运行的任务，如 miyoushe weather (默认全部)")
+    parser.add_argument("--drain", action="store_true", help="只补发 outbox 中未送达的报告")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args(sys.argv[1:])
+    if args.drain:
+        drain()
+    else:
+        main(",".join(args.tasks) if args.tasks else None)
@@ -1 +1,41 @@
 # Tasks module
+"""
+任务注册表
+任务按名称登记，执行时才导入对应模块，只运行部分任务时不加载其他模块
+"""
+
+import importlib
+
+# 任务名称: (报告标题, 模块路径)，报告按此顺序拼接
+TASK_REGISTRY = {
+    "miyoushe": ("米游社签到", "tasks.miyoushe"),
+    "weather": ("今日天气", "tasks.weather"),
+    "bangumi": ("番剧更新", "tasks.bangumi"),
+    "conference": ("会议DDL", "tasks.conference"),
+}
+
+
+def parse_task_names(selection: str = "") -> list:
+    """
+    解析任务选择 (逗号分隔)，为空时返回全部任务
+
+    Returns:
+        按注册顺序排列的任务名称列表，忽略未知名称
+    """
+    wanted = {name.strip().lower() for name in selection.split(",") if name.strip()}
+    if not wanted:
+        return list(TASK_REGISTRY)
+
+    for name in sorted(wanted - set(TASK_REGISTRY)):
+        print(f"未知任务: {name}")
+    return [name for name in TASK_REGISTRY if name in wanted]
+
+
+def get_task_title(name: str) -> str:
+    """任务的报告标题"""
+    return TASK_REGISTRY[name][0]
+
+
+def load_task(name: str):
+    """导入任务模块并返回其 run 函数"""
+    return importlib.import_module(TASK_REGISTRY[name][1]).run
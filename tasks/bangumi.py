@@ -6,9 +6,14 @@
 """
 
 import os
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
+from utils import client, httpcache, store
+from utils.matcher import get_matcher, normalize
+from utils.model import Item, Metric, Section, Status
+
 # 用户追番列表（番剧名称，模糊匹配）
 # 可通过环境变量配置，用逗号分隔
 WATCHLIST_STR = os.environ.get("BANGUMI_WATCHLIST", "")
@@ -17,6 +22,20 @@ WATCHLIST = [x.strip() for x in WATCHLIST_STR.split(",") if x.strip()]
 # Bangumi API
 CALENDAR_URL = "https://api.bgm.tv/calendar"
 
+SUBJECT_URL = "https://api.bgm.tv/v0/subjects/{subject_id}"
+EPISODES_URL = "https://api.bgm.tv/v0/episodes"
+
+# 章节列表每页条数 (API 上限 100)
+EPISODES_PAGE_SIZE = 100
+
+# 放送表快照最长使用时间（小时），超过或换季时重新下载
+SNAPSHOT_MAX_AGE = float(os.environ.get("BANGUMI_SNAPSHOT_MAX_AGE", "72"))
+
+# 番剧详情 (话数、放送时间) 并发请求数、总时间预算（秒）和缓存有效期（秒）
+ENRICH_WORKERS = int(os.environ.get("BANGUMI_ENRICH_WORKERS", "4"))
+ENRICH_BUDGET = float(os.environ.get("BANGUMI_ENRICH_BUDGET", "10"))
+DETAIL_CACHE_TTL = int(os.environ.get("BANGUMI_DETAIL_TTL", "259200"))
+
 # 星期映射
 WEEKDAY_MAP = {
     0: "周一",
@@ -30,56 +49,201 @@ WEEKDAY_MAP = {
 
 
 def get_calendar() -> list:
-    """获取每日放送表"""
+    """获取每日放送表 (条件请求，内容未变化时读本地缓存)"""
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (compatible; DailyTasks/1.0)"
-        }
-        resp = requests.get(CALENDAR_URL, headers=headers, timeout=10)
+        resp = httpcache.get(CALENDAR_URL)
         return resp.json()
     except Exception as e:
         print(f"获取放送表异常: {e}")
     return []
 
 
-def get_today_bangumi() -> list:
-    """获取今日放送的番剧"""
+def get_season(now: datetime = None) -> str:
+    """当前番季 (1/4/7/10 月换季)，如 2026Q4"""
+    now = now or datetime.now()
+    return f"{now.year}Q{(now.month - 1) // 3 + 1}"
+
+
+def build_weekday_index(calendar: list) -> dict:
+    """按星期拆分放送表 {"1": [...], ..., "7": [...]}"""
+    index = {}
+    for day in calendar:
+        weekday_id = day.get("weekday", {}).get("id")
+        if weekday_id is not None:
+            index[str(weekday_id)] = day.get("items", [])
+    return index
+
+
+def load_calendar_snapshot(now: datetime = None) -> dict:
+    """
+    获取按星期拆分的一周放送表快照
+
+    快照未过期且未换季时直接使用本地数据，否则重新下载；下载失败时沿用旧快照
+
+    Returns:
+        {"fetched_at": 时间戳, "season": 番季, "days": 按星期拆分的放送表}
+    """
+    now = now or datetime.now()
+    path = store.cache_path("bangumi", "calendar_snapshot.json")
+    snapshot = store.load_json(path)
+
+    if (snapshot and snapshot.get("season") == get_season(now)
+            and time.time() - snapshot.get("fetched_at", 0) < SNAPSHOT_MAX_AGE * 3600):
+        return snapshot
+
     calendar = get_calendar()
     if not calendar:
-        return []
+        return snapshot or {}
+
+    snapshot = {
+        "fetched_at": int(time.time()),
+        "season": get_season(now),
+        "days": build_weekday_index(calendar),
+    }
+    store.save_json(path, snapshot)
+    return snapshot
+
+
+def get_today_bangumi() -> list:
+    """获取今日放送的番剧"""
+    now = datetime.now()
+    snapshot = load_calendar_snapshot(now)
 
     # 今天是星期几 (0=周一, 6=周日)
-    today_weekday = datetime.now().weekday()
+    today_weekday = now.weekday()
     # Bangumi API 的星期 (1=周一, 7=周日)
     bgm_weekday = today_weekday + 1
 
-    for day in calendar:
-        if day.get("weekday", {}).get("id") == bgm_weekday:
-            return day.get("items", [])
-
-    return []
+    return snapshot.get("days", {}).get(str(bgm_weekday), [])
 
 
 def filter_watchlist(bangumi_list: list) -> list:
-    """筛选追番列表中的番剧"""
+    """筛选追番列表中的番剧 (归一化后多关键词匹配，匹配器按追番列表缓存)"""
     if not WATCHLIST:
         return bangumi_list  # 未配置追番列表则返回全部
 
+    matcher = get_matcher(tuple(WATCHLIST))
     matched = []
     for bangumi in bangumi_list:
-        name = bangumi.get("name", "")
-        name_cn = bangumi.get("name_cn", "")
-
-        for watch_name in WATCHLIST:
-            if watch_name.lower() in name.lower() or watch_name.lower() in name_cn.lower():
-                matched.append(bangumi)
-                break
+        name = normalize(bangumi.get("name", ""))
+        name_cn = normalize(bangumi.get("name_cn", ""))
+        if matcher.contains_any(name) or matcher.contains_any(name_cn):
+            matched.append(bangumi)
 
     return matched
 
 
-def format_bangumi_message() -> str:
-    """格式化番剧消息"""
+def fetch_episodes(subject_id: int) -> list:
+    """
+    获取包含最近一次放送的一页章节
+
+    章节按顺序分页，长篇番剧的当前话在最后几页：先用第一页的 total 直接请求最后一页，
+    最后一页全部未放送时再向前翻页
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    params = {"subject_id": subject_id, "type": 0, "limit": EPISODES_PAGE_SIZE, "offset": 0}
+    first = client.get(EPISODES_URL, params=params).json()
+
+    offset = first.get("total", 0) - EPISODES_PAGE_SIZE
+    while offset > 0:
+        params["offset"] = offset
+        episodes = client.get(EPISODES_URL, params=params).json().get("data", [])
+        if any(ep.get("airdate") and ep["airdate"] <= today for ep in episodes):
+            return episodes
+        offset -= EPISODES_PAGE_SIZE
+    return first.get("data", [])
+
+
+def fetch_subject_detail(subject_id: int) -> dict:
+    """
+    获取番剧详情
+
+    Returns:
+        {"air_time": 放送时间, "episodes": [[话数, 放送日期], ...]}，失败返回 None
+    """
+    try:
+        subject = client.get(SUBJECT_URL.format(subject_id=subject_id)).json()
+        episodes = fetch_episodes(subject_id)
+    except Exception as e:
+        print(f"获取番剧详情异常 ({subject_id}): {e}")
+        return None
+
+    air_time = ""
+    for item in subject.get("infobox") or []:
+        if item.get("key") == "放送时间" and isinstance(item.get("value"), str):
+            air_time = item["value"]
+            break
+
+    return {
+        "air_time": air_time,
+        "episodes": [
+            [ep.get("ep") or ep.get("sort"), ep.get("airdate", "")]
+            for ep in episodes
+        ],
+    }
+
+
+def get_current_episode(detail: dict, date_str: str):
+    """今天 (或最近一次) 放送的话数"""
+    current = None
+    for ep, airdate in detail.get("episodes", []):
+        if airdate and airdate <= date_str:
+            current = ep
+    if isinstance(current, float) and current.is_integer():
+        current = int(current)
+    return current
+
+
+def enrich_bangumi(bangumi_list: list) -> dict:
+    """
+    并发获取番剧详情，优先使用本地缓存
+
+    超出 ENRICH_BUDGET 仍未返回的番剧不等待，只显示放送表信息
+
+    Returns:
+        {番剧 ID: 详情}
+    """
+    path = store.cache_path("bangumi", "subjects.json")
+    cache = store.load_json(path, {})
+    now = time.time()
+
+    details = {}
+    missing = []
+    for bangumi in bangumi_list:
+        subject_id = bangumi.get("id")
+        if subject_id is None:
+            continue
+        cached = cache.get(str(subject_id))
+        if cached and now - cached.get("fetched_at", 0) < DETAIL_CACHE_TTL:
+            details[subject_id] = cached["detail"]
+        else:
+            missing.append(subject_id)
+
+    if not missing:
+        return details
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(ENRICH_WORKERS, len(missing))))
+    futures = {executor.submit(fetch_subject_detail, subject_id): subject_id for subject_id in missing}
+    done, not_done = wait(futures, timeout=ENRICH_BUDGET)
+    executor.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        print(f"番剧详情超时，{len(not_done)} 部只显示放送表信息")
+
+    for future in done:
+        detail = future.result()
+        if detail is not None:
+            subject_id = futures[future]
+            details[subject_id] = detail
+            cache[str(subject_id)] = {"fetched_at": int(now), "detail": detail}
+
+    # 清理过期条目
+    cache = {k: v for k, v in cache.items() if now - v.get("fetched_at", 0) < DETAIL_CACHE_TTL}
+    store.save_json(path, cache)
+    return details
+
+
+def format_bangumi_message() -> Section:
+    """生成番剧更新段落"""
     today = datetime.now()
     weekday = WEEKDAY_MAP.get(today.weekday(), "")
     date_str = today.strftime("%Y-%m-%d")
@@ -87,46 +251,64 @@ def format_bangumi_message() -> str:
     today_bangumi = get_today_bangumi()
     filtered = filter_watchlist(today_bangumi)
 
-    lines = [f"<b>番剧更新 - {date_str} {weekday}</b>", ""]
+    section = Section(items=[Item.heading(f"番剧更新 - {date_str} {weekday}"), Item.blank()])
 
     if not today_bangumi:
-        lines.append("获取放送表失败")
-        return "<br>".join(lines)
+        section.add("获取放送表失败", status=Status.ERROR)
+        return section
+
+    section.metrics = [Metric("today", len(today_bangumi)), Metric("matched", len(filtered))]
 
     if WATCHLIST and not filtered:
-        lines.append("今日追番列表中没有更新")
-        lines.append("")
-        lines.append(f"<small>追番: {', '.join(WATCHLIST)}</small>")
-        return "<br>".join(lines)
+        section.add("今日追番列表中没有更新")
+        section.items.append(Item.blank())
+        section.items.append(Item.note(f"追番: {', '.join(WATCHLIST)}"))
+        return section
 
     # 显示番剧列表
     if WATCHLIST:
-        lines.append(f"<b>今日更新 ({len(filtered)} 部):</b>")
+        section.items.append(Item.heading(f"今日更新 ({len(filtered)} 部):"))
     else:
-        lines.append(f"<b>今日全部更新 ({len(filtered)} 部):</b>")
+        section.items.append(Item.heading(f"今日全部更新 ({len(filtered)} 部):"))
+
+    shown = filtered[:10]  # 最多显示10部
+    details = enrich_bangumi(shown)
 
-    for bangumi in filtered[:10]:  # 最多显示10部
+    for bangumi in shown:
         name_cn = bangumi.get("name_cn") or bangumi.get("name", "未知")
         rating = bangumi.get("rating", {}).get("score", "N/A")
 
+        ep_info = ""
+        episode = None
+        detail = details.get(bangumi.get("id"))
+        if detail:
+            episode = get_current_episode(detail, date_str)
+            if episode is not None:
+                ep_info += f" 第{episode}话"
+            if detail.get("air_time"):
+                ep_info += f" {detail['air_time']}"
+
         air_info = ""
         if bangumi.get("air_date"):
             air_info = f" ({bangumi['air_date']})"
 
-        lines.append(f"• {name_cn} ⭐{rating}{air_info}")
+        section.items.append(Item.bullet(
+            f"{name_cn} ⭐{rating}{ep_info}{air_info}",
+            data={"id": bangumi.get("id"), "name": name_cn, "rating": rating, "episode": episode},
+        ))
 
     if len(filtered) > 10:
-        lines.append(f"... 还有 {len(filtered) - 10} 部")
+        section.add(f"... 还有 {len(filtered) - 10} 部")
 
-    return "<br>".join(lines)
+    return section
 
 
-def run() -> str:
+def run() -> Section:
     """
     执行番剧更新查询
 
     Returns:
-        格式化的番剧更新消息
+        番剧更新段落
     """
     print("=" * 50)
     print("番剧更新提醒")
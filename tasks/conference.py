@@ -6,9 +6,12 @@ Data source: https://sec-deadlines.github.io/
 """
 
 import os
-import requests
+from bisect import bisect_right
 from datetime import datetime, timedelta
 
+from utils import httpcache, store
+from utils.model import Item, Metric, Section, Status
+
 # Conference data URL
 CONF_URL = "https://raw.githubusercontent.com/sec-deadlines/sec-deadlines.github.io/master/_data/conferences.yml"
 
@@ -20,21 +23,58 @@ DAYS_AHEAD = int(os.environ.get("CONF_DAYS_AHEAD", "30"))
 FILTER_TAGS_STR = os.environ.get("CONF_FILTER_TAGS", "SEC,CRYPTO")
 FILTER_TAGS = [t.strip().upper() for t in FILTER_TAGS_STR.split(",") if t.strip()]
 
+# "full": send the top deadlines every day
+# "changes": send only new/moved/more urgent deadlines, full digest on CONF_DIGEST_WEEKDAY
+NOTIFY_MODE = os.environ.get("CONF_NOTIFY_MODE", "full").strip().lower()
+
+# Weekday for the full digest in "changes" mode (0 = Monday, empty = never)
+DIGEST_WEEKDAY_STR = os.environ.get("CONF_DIGEST_WEEKDAY", "0").strip()
+DIGEST_WEEKDAY = int(DIGEST_WEEKDAY_STR) if DIGEST_WEEKDAY_STR else None
+
+# Urgency icons by bucket (see get_urgency_bucket)
+URGENCY_ICONS = ("🔴", "🟠", "🟡", "🟢")
+
+# Bump when parsing or normalization changes (invalidates the deadline index)
+PARSER_VERSION = 1
+
+# Bump when the deadline index layout changes
+INDEX_VERSION = 2
+
+# Deadline types stored in the index
+DEADLINE_TYPES = ('paper', 'abstract')
 
-def parse_yaml_simple(text: str) -> list:
+# Bump when the layout of the "changes" mode state file changes
+STATE_VERSION = 2
+
+
+def _has_future_deadline(conf: dict, now: datetime) -> bool:
+    """Check if any deadline is after now (abstract deadlines are earlier, so this covers them too)"""
+    for dl_str in conf.get('deadlines', []):
+        dl = parse_deadline(dl_str)
+        if dl and dl > now:
+            return True
+    return False
+
+
+def iter_conferences(lines, now: datetime = None):
     """
-    Simple YAML parser for conference data
-    (avoiding external dependency)
+    Streaming parser for conference data (avoiding external dependency)
+
+    Consumes lines one at a time and yields one dict per conference.
+    If now is given, conferences whose deadlines are all in the past
+    are dropped. Tags are not filtered here; see query_deadline_index.
     """
-    conferences = []
     current = {}
 
-    for line in text.split('\n'):
+    def keep(conf):
+        return bool(conf) and (now is None or _has_future_deadline(conf, now))
+
+    for line in lines:
         line = line.rstrip()
 
         if line.startswith('- name:'):
-            if current:
-                conferences.append(current)
+            if keep(current):
+                yield current
             current = {'name': line.split(':', 1)[1].strip()}
         elif line.strip().startswith('- "') and 'deadlines' in current:
             # Multi-line deadline item (must check before key:value due to time containing ":")
@@ -68,21 +108,8 @@ def parse_yaml_simple(text: str) -> list:
             else:
                 current[key] = value.strip('"\'')
 
-    if current:
-        conferences.append(current)
-
-    return conferences
-
-
-def fetch_conferences() -> list:
-    """Fetch conference data from GitHub"""
-    try:
-        resp = requests.get(CONF_URL, timeout=15)
-        if resp.status_code == 200:
-            return parse_yaml_simple(resp.text)
-    except Exception as e:
-        print(f"Failed to fetch conferences: {e}")
-    return []
+    if keep(current):
+        yield current
 
 
 def parse_deadline(deadline_str: str) -> datetime:
@@ -102,123 +129,366 @@ def has_abstract_registration(comment: str) -> bool:
     return 'abstract' in comment_lower and 'registration' in comment_lower
 
 
-def get_upcoming_deadlines() -> list:
-    """Get conferences with upcoming deadlines"""
-    conferences = fetch_conferences()
-    now = datetime.now()
-    cutoff = now + timedelta(days=DAYS_AHEAD)
+def normalize_conference(conf: dict) -> dict:
+    """Precompute parsed deadline timestamps and the abstract registration flag"""
+    times = []
+    for dl_str in conf.get('deadlines', []):
+        dl = parse_deadline(dl_str)
+        times.append(int(dl.timestamp()) if dl else None)
+    conf['deadline_times'] = times
+    conf['abstract_registration'] = has_abstract_registration(conf.get('comment', ''))
+    return conf
 
-    upcoming = []
+
+def build_deadline_index(conferences, content_hash: str = None) -> dict:
+    """
+    Build a sorted deadline index from normalized conference records
+
+    Each entry is (deadline timestamp, conference id, type), sorted by
+    timestamp, with abstract registration deadlines (1 week before)
+    precomputed. Conferences are stored once in a compact table.
+    """
+    table = []
+    entries = []
 
     for conf in conferences:
-        # Filter by tags
-        conf_tags = [t.upper() for t in conf.get('tags', [])]
-        if FILTER_TAGS:
-            if not any(t in conf_tags for t in FILTER_TAGS):
-                continue
+        deadlines = [
+            (ts, dl_str)
+            for ts, dl_str in zip(conf['deadline_times'], conf.get('deadlines', []))
+            if ts is not None
+        ]
+        if not deadlines:
+            continue
+
+        conf_id = len(table)
+        table.append([
+            conf.get('name', 'Unknown'),
+            conf.get('description', ''),
+            conf.get('date', ''),
+            conf.get('place', ''),
+            conf.get('link', ''),
+            [t.upper() for t in conf.get('tags', [])],
+        ])
+
+        for ts, dl_str in deadlines:
+            entries.append((ts, conf_id, 0, dl_str))
+            if conf['abstract_registration']:
+                abstract_dl = datetime.fromtimestamp(ts) - timedelta(days=7)
+                entries.append((int(abstract_dl.timestamp()), conf_id, 1, abstract_dl.strftime("%Y-%m-%d %H:%M")))
+
+    entries.sort(key=lambda e: e[0])
+    return {
+        'version': INDEX_VERSION,
+        'parser_version': PARSER_VERSION,
+        'hash': content_hash,
+        'timestamps': [e[0] for e in entries],
+        'conf_ids': [e[1] for e in entries],
+        'types': [e[2] for e in entries],
+        'deadline_strs': [e[3] for e in entries],
+        'conferences': table,
+    }
+
+
+def get_index_path() -> str:
+    return store.cache_path("conference", "deadline_index.json")
+
+
+def load_deadline_index() -> dict:
+    """
+    Load the deadline index, rebuilding it only when the source changed
 
-        # Check if abstract registration required
-        comment = conf.get('comment', '')
-        needs_abstract_reg = has_abstract_registration(comment)
+    The cached index is reused when its hash matches the content hash
+    of conferences.yml (known without parsing when the upstream answers
+    304 or the cached copy is served). A fresh download is parsed while
+    it streams; its hash is known once the body is complete.
+    """
+    path = get_index_path()
+    index = store.load_json(path)
+    stream = httpcache.iter_lines(CONF_URL, timeout=15)
+
+    if (index and index.get('version') == INDEX_VERSION
+            and index.get('parser_version') == PARSER_VERSION
+            and stream.sha256 and index.get('hash') == stream.sha256):
+        return index
+
+    now = datetime.now()
+    conferences = [normalize_conference(conf) for conf in iter_conferences(stream, now=now)]
+    index = build_deadline_index(conferences, stream.sha256)
+    if stream.sha256:
+        store.save_json(path, index)
+    return index
 
-        # Check deadlines
-        deadlines = conf.get('deadlines', [])
-        for dl_str in deadlines:
-            dl = parse_deadline(dl_str)
-            if not dl:
-                continue
 
-            # Add abstract registration deadline (1 week before) if applicable
-            if needs_abstract_reg:
-                abstract_dl = dl - timedelta(days=7)
-                if now < abstract_dl <= cutoff:
-                    days_left = (abstract_dl - now).days
-                    upcoming.append({
-                        'name': conf.get('name', 'Unknown'),
-                        'description': conf.get('description', ''),
-                        'deadline': abstract_dl,
-                        'deadline_str': abstract_dl.strftime("%Y-%m-%d %H:%M"),
-                        'days_left': days_left,
-                        'date': conf.get('date', ''),
-                        'place': conf.get('place', ''),
-                        'link': conf.get('link', ''),
-                        'tags': conf_tags,
-                        'type': 'abstract'  # Abstract registration
-                    })
-
-            # Add paper submission deadline
-            if now < dl <= cutoff:
-                days_left = (dl - now).days
-                upcoming.append({
-                    'name': conf.get('name', 'Unknown'),
-                    'description': conf.get('description', ''),
-                    'deadline': dl,
-                    'deadline_str': dl_str,
-                    'days_left': days_left,
-                    'date': conf.get('date', ''),
-                    'place': conf.get('place', ''),
-                    'link': conf.get('link', ''),
-                    'tags': conf_tags,
-                    'type': 'paper'  # Paper submission
-                })
-
-    # Sort by deadline
-    upcoming.sort(key=lambda x: x['deadline'])
+def query_deadline_index(index: dict, start: datetime, end: datetime, filter_tags: list = None) -> list:
+    """Get deadlines in (start, end] from the index with a bisect range query"""
+    timestamps = index['timestamps']
+    lo = bisect_right(timestamps, int(start.timestamp()))
+    hi = bisect_right(timestamps, int(end.timestamp()))
+
+    upcoming = []
+    for i in range(lo, hi):
+        name, description, date, place, link, conf_tags = index['conferences'][index['conf_ids'][i]]
+        if filter_tags and not any(t in conf_tags for t in filter_tags):
+            continue
+
+        deadline = datetime.fromtimestamp(timestamps[i])
+        if not start < deadline <= end:
+            continue
+        upcoming.append({
+            'name': name,
+            'description': description,
+            'deadline': deadline,
+            'deadline_str': index['deadline_strs'][i],
+            'days_left': (deadline - start).days,
+            'date': date,
+            'place': place,
+            'link': link,
+            'tags': conf_tags,
+            'type': DEADLINE_TYPES[index['types'][i]],
+        })
     return upcoming
 
 
-def format_deadline_message() -> str:
-    """Format upcoming deadlines as message"""
-    upcoming = get_upcoming_deadlines()
+def fetch_upcoming_deadlines(days_ahead: int = None, filter_tags: list = None) -> list:
+    """
+    Get conferences with upcoming deadlines
+
+    Args:
+        days_ahead: Window size in days (default: DAYS_AHEAD)
+        filter_tags: Tags to keep (default: FILTER_TAGS)
+
+    Raises:
+        Exception: The data could not be fetched and there is no cached copy
+    """
+    days_ahead = DAYS_AHEAD if days_ahead is None else days_ahead
+    filter_tags = FILTER_TAGS if filter_tags is None else filter_tags
+    now = datetime.now()
+    return query_deadline_index(load_deadline_index(), now, now + timedelta(days=days_ahead), filter_tags)
 
-    lines = [f"**Conference Deadlines** (next {DAYS_AHEAD} days)", ""]
+
+def get_upcoming_deadlines(days_ahead: int = None, filter_tags: list = None) -> list:
+    """Same as fetch_upcoming_deadlines, but returns an empty list if the fetch fails"""
+    try:
+        return fetch_upcoming_deadlines(days_ahead, filter_tags)
+    except Exception as e:
+        print(f"Failed to fetch conferences: {e}")
+        return []
+
+
+def get_urgency_bucket(days: int) -> int:
+    """Urgency bucket: 0 = today, 1 = <=3 days, 2 = <=7 days, 3 = later"""
+    if days == 0:
+        return 0
+    if days <= 3:
+        return 1
+    if days <= 7:
+        return 2
+    return 3
+
+
+def format_urgency(days: int) -> str:
+    """Urgency indicator for a deadline"""
+    bucket = get_urgency_bucket(days)
+    if bucket == 0:
+        return "🔴 TODAY"
+    return f"{URGENCY_ICONS[bucket]} {days}d"
+
+
+def format_deadline_lines(conf: dict) -> list:
+    """Format one deadline entry as report items"""
+    name = conf['name']
+    dl_date = conf['deadline'].strftime("%m/%d")
+    urgency = format_urgency(conf['days_left'])
+
+    # Show deadline type
+    dl_type = conf.get('type', 'paper')
+    if dl_type == 'abstract':
+        type_label = "[摘要注册]"
+    else:
+        type_label = "[论文提交]"
+
+    data = {
+        'name': name,
+        'type': dl_type,
+        'deadline': conf['deadline_str'],
+        'days_left': conf['days_left'],
+    }
+    items = [Item.bullet(f"{type_label} - {dl_date} ({urgency})", label=name, data=data)]
+    if conf['description']:
+        items.append(Item.detail(conf['description'][:50]))
+    return items
+
+
+def format_deadline_message(upcoming: list = None) -> Section:
+    """Build the report section listing upcoming deadlines"""
+    if upcoming is None:
+        upcoming = get_upcoming_deadlines()
+
+    section = Section(
+        items=[Item(f"(next {DAYS_AHEAD} days)", label="Conference Deadlines"), Item.blank()],
+        metrics=[Metric("upcoming", len(upcoming))],
+    )
 
     if not upcoming:
-        lines.append("No upcoming deadlines")
+        section.add("No upcoming deadlines")
         if FILTER_TAGS:
-            lines.append(f"(Filter: {', '.join(FILTER_TAGS)})")
-        return "\n".join(lines)
+            section.add(f"(Filter: {', '.join(FILTER_TAGS)})")
+        return section
 
     for conf in upcoming[:10]:  # Max 10
-        days = conf['days_left']
-        if days == 0:
-            urgency = "🔴 TODAY"
-        elif days <= 3:
-            urgency = f"🟠 {days}d"
-        elif days <= 7:
-            urgency = f"🟡 {days}d"
-        else:
-            urgency = f"🟢 {days}d"
-
-        name = conf['name']
-        dl_date = conf['deadline'].strftime("%m/%d")
-
-        # Show deadline type
-        dl_type = conf.get('type', 'paper')
-        if dl_type == 'abstract':
-            type_label = "[摘要注册]"
-        else:
-            type_label = "[论文提交]"
-
-        lines.append(f"• **{name}** {type_label} - {dl_date} ({urgency})")
-        if conf['description']:
-            lines.append(f"  {conf['description'][:50]}")
+        section.items.extend(format_deadline_lines(conf))
 
     if len(upcoming) > 10:
-        lines.append(f"... and {len(upcoming) - 10} more")
+        section.add(f"... and {len(upcoming) - 10} more")
+
+    return section
+
+
+def get_state_path() -> str:
+    return store.cache_path("conference", "last_deadlines.json")
+
+
+def snapshot_deadlines(upcoming: list) -> dict:
+    """
+    Group the deadlines of a run by "name|type" for diffing
+
+    Returns:
+        {"name|type": [{'deadline_str': ..., 'bucket': ...}, ...]}
+    """
+    snapshot = {}
+    for conf in upcoming:
+        snapshot.setdefault(f"{conf['name']}|{conf.get('type', 'paper')}", []).append({
+            'deadline_str': conf['deadline_str'],
+            'bucket': get_urgency_bucket(conf['days_left']),
+        })
+    return snapshot
+
+
+def diff_deadlines(previous: dict, upcoming: list, now: datetime = None) -> dict:
+    """
+    Compare this run's deadlines against the previous run
+
+    Within each conference and type, current deadlines are first matched
+    to previous ones with the same date. Only the leftovers on both sides
+    are paired up (in date order) as moved; extra current ones are new.
+    Previous deadlines that have already passed are dropped before
+    pairing, so a conference with several rounds does not report a move
+    when its earlier round expires.
+
+    Returns:
+        {'new': [...], 'moved': [(conf, old_deadline_str), ...], 'urgent': [...]}
+    """
+    now = now or datetime.now()
+    current = {}
+    for conf in upcoming:
+        current.setdefault(f"{conf['name']}|{conf.get('type', 'paper')}", []).append(conf)
+
+    changes = {'new': [], 'moved': [], 'urgent': []}
+    for key, confs in current.items():
+        remaining = [
+            before for before in previous.get(key, [])
+            if (parse_deadline(before['deadline_str']) or now) > now
+        ]
+        unmatched = []
+        for conf in confs:
+            before = next((b for b in remaining if b['deadline_str'] == conf['deadline_str']), None)
+            if before is None:
+                unmatched.append(conf)
+                continue
+            remaining.remove(before)
+            if get_urgency_bucket(conf['days_left']) < before['bucket']:
+                changes['urgent'].append(conf)
+
+        remaining.sort(key=lambda b: b['deadline_str'])
+        for conf, before in zip(unmatched, remaining):
+            changes['moved'].append((conf, before['deadline_str']))
+        changes['new'].extend(unmatched[len(remaining):])
+    return changes
+
+
+def format_changes_message(changes: dict) -> Section:
+    """Build a section with only the changed deadlines (no items if nothing changed)"""
+    section = Section(metrics=[Metric(kind, len(confs)) for kind, confs in changes.items()])
+    if not any(changes.values()):
+        return section
+
+    section.items = [Item(f"(next {DAYS_AHEAD} days)", label="Conference Deadline Changes"), Item.blank()]
+
+    if changes['new']:
+        section.items.append(Item.heading("New"))
+        for conf in changes['new']:
+            section.items.extend(format_deadline_lines(conf))
+        section.items.append(Item.blank())
+
+    if changes['moved']:
+        section.items.append(Item.heading("Moved / Extended"))
+        for conf, old_deadline in changes['moved']:
+            section.items.extend(format_deadline_lines(conf))
+            section.items.append(Item.detail(f"was {old_deadline}"))
+        section.items.append(Item.blank())
+
+    if changes['urgent']:
+        section.items.append(Item.heading("Now More Urgent"))
+        for conf in changes['urgent']:
+            section.items.extend(format_deadline_lines(conf))
+        section.items.append(Item.blank())
+
+    section.items.pop()  # trailing blank
+    return section
+
+
+def is_digest_day(today: datetime = None) -> bool:
+    """Check if today is the weekday for the full digest"""
+    today = today or datetime.now()
+    return DIGEST_WEEKDAY is not None and today.weekday() == DIGEST_WEEKDAY
+
+
+def format_fetch_warning(error: Exception) -> Section:
+    """Section shown in "changes" mode when the data could not be fetched"""
+    return Section(items=[
+        Item("", label="Conference Deadline Changes"),
+        Item(f"Failed to fetch deadlines, changes not checked ({error})", status=Status.WARN),
+    ])
+
+
+def format_notification() -> Section:
+    """
+    Build the deadline section for the configured NOTIFY_MODE
+
+    In "changes" mode only the delta against the previous run is sent,
+    except on the digest weekday or when there is no previous run.
+    """
+    if NOTIFY_MODE != 'changes':
+        return format_deadline_message(get_upcoming_deadlines())
+
+    try:
+        upcoming = fetch_upcoming_deadlines()
+    except Exception as e:
+        print(f"Failed to fetch conferences: {e}")
+        return format_fetch_warning(e)
+
+    state_path = get_state_path()
+    previous = store.load_json(state_path)
+    store.save_json(state_path, {
+        'version': STATE_VERSION,
+        'date': datetime.now().strftime("%Y-%m-%d"),
+        'deadlines': snapshot_deadlines(upcoming),
+    })
 
-    return "\n".join(lines)
+    if previous is None or previous.get('version') != STATE_VERSION or is_digest_day():
+        return format_deadline_message(upcoming)
+    return format_changes_message(diff_deadlines(previous.get('deadlines', {}), upcoming))
 
 
-def run() -> str:
+def run() -> Section:
     """
     Get upcoming conference deadlines
 
     Returns:
-        Formatted deadline message
+        Deadline report section
     """
     print("=" * 50)
     print("Conference Deadlines")
     print("=" * 50)
 
-    return format_deadline_message()
+    return format_notification()
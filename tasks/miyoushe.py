@@ -11,11 +11,24 @@ import random
 import hashlib
 import string
 import json
-import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import client, ledger, ratelimit, store
+from utils.model import Item, Metric, Section, Status
 
 # 从环境变量读取 Cookie
 COOKIE = os.environ.get("MIYOUSHE_COOKIE", "")
 
+# 多账号：MIYOUSHE_COOKIES 每行一个 Cookie，MIYOUSHE_COOKIE_FILE 指向每行一个 Cookie 的文件
+COOKIES_STR = os.environ.get("MIYOUSHE_COOKIES", "")
+COOKIE_FILE = os.environ.get("MIYOUSHE_COOKIE_FILE", "")
+
+# 并发签到的账号数
+MAX_WORKERS = int(os.environ.get("MIYOUSHE_WORKERS", "4"))
+
+# 角色缓存有效期（秒），默认 7 天
+ROLE_CACHE_TTL = int(os.environ.get("MIYOUSHE_ROLE_CACHE_TTL", "604800"))
+
 # 游戏配置
 GAMES = {
     "hkrpg": {  # 崩坏：星穹铁道
@@ -56,6 +69,18 @@ GAMES = {
 # API 地址
 ROLE_URL = "https://api-takumi.mihoyo.com/binding/api/getUserGameRolesByCookie"
 
+# 签到返回这些 retcode 说明角色不存在，需要刷新角色缓存
+ROLE_ERROR_RETCODES = {-10002}
+
+# 风控/限流 retcode，遇到时降低对应接口的请求速率
+RISK_RETCODES = {1034}
+
+# 可以重试的临时错误 retcode ("网络出小差了，请稍后重试")
+RETRY_RETCODES = {-1}
+
+# 已签到，重试没有意义
+ALREADY_SIGNED_RETCODE = -5003
+
 # 不同游戏使用不同的签到 API
 API_URLS = {
     "luna": {
@@ -106,17 +131,110 @@ def get_cookie_dict(cookie_str):
     return cookie_dict
 
 
-def get_game_roles(cookies, game_biz):
-    """获取绑定的游戏角色"""
-    params = {"game_biz": game_biz}
+def parse_cookie_lines(text):
+    """解析多行 Cookie 文本，忽略空行和 # 开头的注释行"""
+    cookies = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            cookies.append(line)
+    return cookies
+
+
+def load_accounts():
+    """
+    读取所有账号 Cookie
+
+    来源依次为 MIYOUSHE_COOKIE、MIYOUSHE_COOKIES、MIYOUSHE_COOKIE_FILE，
+    按出现顺序去重
+    """
+    cookies = parse_cookie_lines(COOKIE) + parse_cookie_lines(COOKIES_STR)
+    if COOKIE_FILE:
+        try:
+            with open(COOKIE_FILE, encoding="utf-8") as f:
+                cookies.extend(parse_cookie_lines(f.read()))
+        except OSError as e:
+            print(f"读取 Cookie 文件异常: {e}")
+    return list(dict.fromkeys(cookies))
+
+
+def get_account_uid(cookies):
+    """从 Cookie 中取米游社 UID"""
+    for key in ("ltuid_v2", "account_id_v2", "ltuid", "account_id", "stuid"):
+        uid = cookies.get(key, "")
+        if uid:
+            return uid
+    return ""
+
+
+def get_account_label(cookies):
+    """生成账号显示名 (打码后的米游社 UID)"""
+    uid = get_account_uid(cookies)
+    if not uid:
+        return "未知账号"
+    return uid[:2] + "****" + uid[-2:] if len(uid) > 4 else uid
+
+
+def get_role_cache_path(cookies):
+    """角色缓存文件路径，文件名取账号 UID 的哈希，不直接暴露 UID"""
+    account = get_account_uid(cookies) or ";".join(f"{k}={v}" for k, v in sorted(cookies.items()))
+    key = hashlib.sha256(account.encode()).hexdigest()[:16]
+    return store.cache_path("miyoushe", f"roles-{key}.json")
+
+
+def invalidate_role_cache(cookies):
+    """删除账号的角色缓存，下次签到重新获取"""
+    store.remove(get_role_cache_path(cookies))
+
+
+def fetch_all_roles(cookies):
+    """一次请求获取账号所有游戏的角色，按 game_biz 分组，失败返回 None"""
     try:
-        resp = requests.get(ROLE_URL, headers=HEADERS, cookies=cookies, params=params, timeout=10)
+        resp = client.get(ROLE_URL, headers=HEADERS, cookies=cookies, retry_if=should_retry)
         data = resp.json()
         if data.get("retcode") == 0:
-            return data.get("data", {}).get("list", [])
+            grouped = {}
+            for role in data.get("data", {}).get("list", []):
+                grouped.setdefault(role.get("game_biz", ""), []).append(role)
+            return grouped
+        print(f"获取角色失败: retcode={data.get('retcode')}, msg={data.get('message')}")
     except Exception as e:
         print(f"获取角色异常: {e}")
-    return []
+    return None
+
+
+def get_all_roles(cookies):
+    """获取账号所有角色 (按 game_biz 分组)，优先使用未过期的本地缓存"""
+    cache_file = get_role_cache_path(cookies)
+    cached = store.load_json(cache_file)
+    if cached and time.time() - cached.get("fetched_at", 0) < ROLE_CACHE_TTL:
+        return cached.get("roles", {})
+
+    roles = fetch_all_roles(cookies)
+    if roles is None:
+        return {}
+    if roles:
+        store.save_json(cache_file, {"fetched_at": int(time.time()), "roles": roles})
+    return roles
+
+
+def is_risk_response(data):
+    """判断响应是否触发了风控 (风控 retcode 或签到返回需要验证码)"""
+    if data.get("retcode") in RISK_RETCODES:
+        return True
+    payload = data.get("data") or {}
+    return bool(payload.get("is_risk")) or payload.get("risk_code", 0) not in (0, None)
+
+
+def should_retry(resp):
+    """判断米游社响应是否需要重试：返回非 JSON 或临时错误 retcode，已签到等确定结果不重试"""
+    try:
+        retcode = resp.json().get("retcode")
+    except ValueError:
+        return True
+    if retcode == ALREADY_SIGNED_RETCODE:
+        return False
+    return retcode in RETRY_RETCODES
 
 
 def get_sign_info(cookies, act_id, region, game_uid, api_type="luna", signgame=""):
@@ -137,8 +255,11 @@ def get_sign_info(cookies, act_id, region, game_uid, api_type="luna", signgame="
         headers["x-rpc-signgame"] = signgame
 
     try:
-        resp = requests.get(info_url, headers=headers, cookies=cookies, params=params, timeout=10)
+        resp = client.get(info_url, headers=headers, cookies=cookies, params=params,
+                          retry_if=should_retry)
         data = resp.json()
+        if data.get("retcode") in RISK_RETCODES:
+            ratelimit.penalize(info_url)
         if data.get("retcode") == 0:
             return data.get("data", {}), None
         else:
@@ -166,37 +287,54 @@ def do_sign(cookies, act_id, region, game_uid, api_type="luna", signgame=""):
         headers["x-rpc-signgame"] = signgame
 
     try:
-        resp = requests.post(sign_url, headers=headers, cookies=cookies, json=payload, timeout=10)
-        return resp.json()
+        resp = client.post(sign_url, headers=headers, cookies=cookies, json=payload,
+                           retry_if=should_retry)
+        data = resp.json()
+        if is_risk_response(data):
+            ratelimit.penalize(sign_url)
+        return data
     except Exception as e:
         print(f"签到请求异常: {e}")
         return {"retcode": -1, "message": str(e)}
 
 
-def sign_game(game_key: str) -> list:
+def sign_game(game_key: str, cookies: dict = None, all_roles: dict = None) -> list:
     """
     执行单个游戏的签到
 
     Args:
         game_key: 游戏标识 (hkrpg, hk4e, bh3, nap)
+        cookies: 账号 Cookie 字典，默认使用 MIYOUSHE_COOKIE
+        all_roles: 按 game_biz 分组的角色，默认调用 get_all_roles 获取
 
     Returns:
-        签到结果列表
+        签到结果列表 (Item，data 中带 game/uid/result/total_sign_day)
     """
     game = GAMES.get(game_key)
     if not game:
-        return [f"未知游戏: {game_key}"]
+        return [Item(f"未知游戏: {game_key}", status=Status.ERROR)]
 
     if not game["enabled"]:
         return []
 
     results = []
-    cookies = get_cookie_dict(COOKIE)
+
+    def add(text: str, result: str, total_sign_day: int):
+        status = Status.ERROR if result == ledger.RESULT_FAILED else Status.OK
+        results.append(Item(
+            f"{game['name']}-{nickname}: {text}", status=status,
+            data={"game": game_key, "uid": game_uid, "result": result, "total_sign_day": total_sign_day},
+        ))
+
+    if cookies is None:
+        cookies = get_cookie_dict(COOKIE)
 
     # 获取游戏角色
-    roles = get_game_roles(cookies, game["game_biz"])
+    if all_roles is None:
+        all_roles = get_all_roles(cookies)
+    roles = all_roles.get(game["game_biz"], [])
     if not roles:
-        return [f"{game['name']}: 未找到绑定角色"]
+        return [Item(f"{game['name']}: 未找到绑定角色", status=Status.WARN)]
 
     # 限制签到角色数量
     max_roles = game.get("max_roles", 0)
@@ -208,61 +346,128 @@ def sign_game(game_key: str) -> list:
         game_uid = role.get("game_uid", "")
         region = role.get("region", "")
 
+        # 台账中今日已签到则跳过网络请求
+        signed, total_sign_day = ledger.get_signed(game_uid, game["act_id"])
+        if signed:
+            add(f"今日已签到，本月累计 {total_sign_day} 天", ledger.RESULT_ALREADY, total_sign_day)
+            continue
+
         # 获取签到信息
         api_type = game.get("api_type", "luna")
         signgame = game.get("signgame", "")
         sign_info, error_msg = get_sign_info(cookies, game["act_id"], region, game_uid, api_type, signgame)
 
         if sign_info is None:
-            results.append(f"{game['name']}-{nickname}: 获取签到信息失败 ({error_msg})")
+            add(f"获取签到信息失败 ({error_msg})", ledger.RESULT_FAILED, 0)
             continue
 
         is_sign = sign_info.get("is_sign", False)
         total_sign_day = sign_info.get("total_sign_day", 0)
 
         if is_sign:
-            results.append(f"{game['name']}-{nickname}: 今日已签到，本月累计 {total_sign_day} 天")
+            ledger.record(game_uid, game["act_id"], ledger.RESULT_ALREADY, total_sign_day)
+            add(f"今日已签到，本月累计 {total_sign_day} 天", ledger.RESULT_ALREADY, total_sign_day)
             continue
 
-        # 随机延迟
-        time.sleep(random.randint(2, 5))
-
-        # 执行签到
+        # 执行签到 (请求间隔由 utils.ratelimit 控制)
         result = do_sign(cookies, game["act_id"], region, game_uid, api_type, signgame)
         retcode = result.get("retcode", -1)
         message = result.get("message", "未知错误")
 
-        if retcode == 0:
-            results.append(f"{game['name']}-{nickname}: 签到成功！本月累计 {total_sign_day + 1} 天")
-        elif retcode == -5003:
-            results.append(f"{game['name']}-{nickname}: 今日已签到，本月累计 {total_sign_day} 天")
+        if is_risk_response(result):
+            ledger.record(game_uid, game["act_id"], ledger.RESULT_FAILED, total_sign_day)
+            add("签到失败 (触发风控验证)", ledger.RESULT_FAILED, total_sign_day)
+        elif retcode == 0:
+            ledger.record(game_uid, game["act_id"], ledger.RESULT_SIGNED, total_sign_day + 1)
+            add(f"签到成功！本月累计 {total_sign_day + 1} 天", ledger.RESULT_SIGNED, total_sign_day + 1)
+        elif retcode == ALREADY_SIGNED_RETCODE:
+            ledger.record(game_uid, game["act_id"], ledger.RESULT_ALREADY, total_sign_day)
+            add(f"今日已签到，本月累计 {total_sign_day} 天", ledger.RESULT_ALREADY, total_sign_day)
+        elif retcode in ROLE_ERROR_RETCODES:
+            invalidate_role_cache(cookies)
+            ledger.record(game_uid, game["act_id"], ledger.RESULT_FAILED, total_sign_day)
+            add(f"签到失败 ({message})，已清除角色缓存", ledger.RESULT_FAILED, total_sign_day)
         else:
-            results.append(f"{game['name']}-{nickname}: 签到失败 ({message})")
+            ledger.record(game_uid, game["act_id"], ledger.RESULT_FAILED, total_sign_day)
+            add(f"签到失败 ({message})", ledger.RESULT_FAILED, total_sign_day)
+
+    return results
+
+
+def sign_account(cookie_str: str) -> list:
+    """
+    执行单个账号所有启用游戏的签到
+
+    Args:
+        cookie_str: 账号 Cookie 字符串
+
+    Returns:
+        该账号的签到结果列表
+    """
+    cookies = get_cookie_dict(cookie_str)
+
+    # 一次获取所有游戏的角色
+    all_roles = get_all_roles(cookies)
 
+    results = []
+    for game_key in GAMES:
+        results.extend(sign_game(game_key, cookies, all_roles))
     return results
 
 
-def run() -> list:
+def run_accounts(cookie_list: list) -> list:
     """
-    执行所有启用的游戏签到
+    使用线程池并发签到多个账号
+
+    Args:
+        cookie_list: Cookie 字符串列表
 
     Returns:
-        所有签到结果列表
+        [(账号显示名, 签到结果列表), ...]，顺序与 cookie_list 一致
+    """
+    def safe_sign(cookie_str):
+        try:
+            return sign_account(cookie_str)
+        except Exception as e:
+            return [Item(f"执行异常: {e}", status=Status.ERROR)]
+
+    labels = [get_account_label(get_cookie_dict(c)) for c in cookie_list]
+    workers = max(1, min(MAX_WORKERS, len(cookie_list)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(safe_sign, cookie_list))
+    return list(zip(labels, results))
+
+
+def run() -> Section:
+    """
+    执行所有账号、所有启用的游戏签到
+
+    Returns:
+        签到结果段落，metrics 中为各结果的角色数
     """
     print("=" * 50)
     print("米游社游戏签到")
     print("=" * 50)
 
-    if not COOKIE:
-        return ["错误：未配置 MIYOUSHE_COOKIE"]
-
-    all_results = []
-    for game_key in GAMES:
-        results = sign_game(game_key)
-        all_results.extend(results)
+    accounts = load_accounts()
+    if not accounts:
+        return Section(items=[Item("错误：未配置 MIYOUSHE_COOKIE", status=Status.ERROR)])
+
+    section = Section()
+    counts = {ledger.RESULT_SIGNED: 0, ledger.RESULT_ALREADY: 0, ledger.RESULT_FAILED: 0}
+    account_results = run_accounts(accounts)
+    for index, (label, results) in enumerate(account_results, 1):
+        # 多账号时为每个账号加标题
+        if len(account_results) > 1:
+            section.items.append(Item.heading(f"账号{index} ({label})"))
+        section.items.extend(results)
+        for item in results:
+            if item.data:
+                counts[item.data["result"]] += 1
 
     # 打印签到结果到控制台
-    for result in all_results:
-        print(result)
+    for item in section.items:
+        print(item.text)
 
-    return all_results
+    section.metrics = [Metric(result, count) for result, count in counts.items()]
+    return section
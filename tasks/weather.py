@@ -6,51 +6,158 @@
 """
 
 import os
-import requests
+import math
+import difflib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+
+from utils import client
+from utils.model import Item, Section
 
 # 默认区域：新加坡国立大学所在区域
 DEFAULT_AREA = os.environ.get("WEATHER_AREA", "Queenstown")
 
+# 多区域：逗号分隔，配置后替代 WEATHER_AREA
+AREAS_STR = os.environ.get("WEATHER_AREAS", "")
+AREAS = [x.strip() for x in AREAS_STR.split(",") if x.strip()]
+
+# 按坐标选择最近的区域："纬度,经度"，多个用分号分隔，如 "1.2966,103.7764;1.3521,103.8198"
+LOCATIONS_STR = os.environ.get("WEATHER_LOCATIONS", "")
+
 # API 地址
 FORECAST_2H_URL = "https://api.data.gov.sg/v1/environment/2-hour-weather-forecast"
 FORECAST_24H_URL = "https://api.data.gov.sg/v1/environment/24-hour-weather-forecast"
 
 
-def get_2h_forecast(area: str = None) -> dict:
-    """获取2小时天气预报"""
-    area = area or DEFAULT_AREA
+def fetch_2h_payload() -> dict:
+    """下载2小时天气预报原始数据"""
     try:
-        resp = requests.get(FORECAST_2H_URL, timeout=10)
-        data = resp.json()
-
-        forecasts = data.get("items", [{}])[0].get("forecasts", [])
-        for f in forecasts:
-            if f.get("area") == area:
-                return {
-                    "area": area,
-                    "forecast": f.get("forecast", "Unknown"),
-                    "time": data.get("items", [{}])[0].get("valid_period", {}).get("start", "")
-                }
-
-        # 如果找不到指定区域，返回第一个
-        if forecasts:
-            return {
-                "area": forecasts[0].get("area", "Unknown"),
-                "forecast": forecasts[0].get("forecast", "Unknown"),
-                "time": data.get("items", [{}])[0].get("valid_period", {}).get("start", ""),
-                "note": f"未找到 {area}，显示 {forecasts[0].get('area')}"
-            }
+        resp = client.get(FORECAST_2H_URL)
+        return resp.json()
     except Exception as e:
         print(f"获取2小时预报异常: {e}")
+    return None
+
+
+def build_area_index(data: dict) -> dict:
+    """
+    把2小时预报整理为按区域名索引
 
+    Returns:
+        {"time": 预报开始时间, "areas": {区域名: 预报}, "first": 第一个区域名}
+    """
+    item = (data.get("items") or [{}])[0]
+    forecasts = item.get("forecasts", [])
+    metadata = tuple(
+        (m.get("name"), m["label_location"]["latitude"], m["label_location"]["longitude"])
+        for m in data.get("area_metadata", [])
+        if m.get("label_location", {}).get("latitude") is not None
+    )
+    return {
+        "time": item.get("valid_period", {}).get("start", ""),
+        "areas": {f.get("area"): f.get("forecast", "Unknown") for f in forecasts},
+        "first": forecasts[0].get("area", "Unknown") if forecasts else None,
+        "metadata": metadata,
+    }
+
+
+def parse_locations(text: str) -> list:
+    """解析 "纬度,经度;纬度,经度" 为坐标列表"""
+    locations = []
+    for item in text.split(";"):
+        lat, _, lon = item.strip().partition(",")
+        try:
+            locations.append((float(lat), float(lon)))
+        except ValueError:
+            if item.strip():
+                print(f"忽略无效坐标: {item.strip()}")
+    return locations
+
+
+class AreaLocator:
+    """区域代表点的二维树，用于按坐标查找最近区域"""
+
+    def __init__(self, metadata):
+        # 按中心纬度把经度换算成等距坐标，新加坡范围内误差可以忽略
+        self.lon_scale = math.cos(math.radians(sum(m[1] for m in metadata) / len(metadata))) if metadata else 1.0
+        points = [(lat, lon * self.lon_scale, name) for name, lat, lon in metadata]
+        self.root = self._build(points, 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 2
+        points.sort(key=lambda p: p[axis])
+        mid = len(points) // 2
+        return (points[mid], axis, self._build(points[:mid], depth + 1), self._build(points[mid + 1:], depth + 1))
+
+    def nearest(self, lat: float, lon: float) -> str:
+        """最近区域名，没有区域数据时返回 None"""
+        target = (lat, lon * self.lon_scale)
+        best = [None, float("inf")]
+
+        def search(node):
+            if node is None:
+                return
+            point, axis, left, right = node
+            dist = (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2
+            if dist < best[1]:
+                best[0], best[1] = point[2], dist
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            search(near)
+            if diff * diff < best[1]:
+                search(far)
+
+        search(self.root)
+        return best[0]
+
+
+@lru_cache(maxsize=8)
+def get_area_locator(metadata: tuple) -> AreaLocator:
+    """按区域元数据构建 (并缓存) 最近区域索引"""
+    return AreaLocator(metadata)
+
+
+def lookup_area(index: dict, area: str) -> dict:
+    """从区域索引中取单个区域的预报"""
+    if area in index["areas"]:
+        return {"area": area, "forecast": index["areas"][area], "time": index["time"]}
+
+    # 名称模糊匹配 (忽略大小写，容忍拼写差异)
+    names = {name.lower(): name for name in index["areas"] if name}
+    close = difflib.get_close_matches(area.lower(), list(names), n=1, cutoff=0.6)
+    if close:
+        name = names[close[0]]
+        return {"area": name, "forecast": index["areas"][name], "time": index["time"],
+                "note": f"未找到 {area}，显示 {name}"}
+
+    # 如果找不到指定区域，返回第一个
+    first = index["first"]
+    if first is not None:
+        return {
+            "area": first,
+            "forecast": index["areas"][first],
+            "time": index["time"],
+            "note": f"未找到 {area}，显示 {first}"
+        }
     return None
 
 
+def get_2h_forecast(area: str = None) -> dict:
+    """获取2小时天气预报"""
+    area = area or DEFAULT_AREA
+    data = fetch_2h_payload()
+    if not data:
+        return None
+    return lookup_area(build_area_index(data), area)
+
+
 def get_24h_forecast() -> dict:
     """获取24小时天气预报"""
     try:
-        resp = requests.get(FORECAST_24H_URL, timeout=10)
+        resp = client.get(FORECAST_24H_URL)
         data = resp.json()
 
         general = data.get("items", [{}])[0].get("general", {})
@@ -74,40 +181,67 @@ def get_24h_forecast() -> dict:
     return None
 
 
-def format_weather_message(area: str = None) -> str:
-    """格式化天气消息"""
-    area = area or DEFAULT_AREA
-    today = datetime.now().strftime("%Y-%m-%d")
+def get_areas(index: dict, area: str = None) -> list:
+    """
+    要显示的区域列表
 
-    forecast_2h = get_2h_forecast(area)
-    forecast_24h = get_24h_forecast()
+    优先级：参数 area > WEATHER_LOCATIONS 的最近区域 + WEATHER_AREAS > WEATHER_AREA
+    """
+    if area:
+        return [area]
 
-    lines = [f"<b>新加坡天气 - {today}</b>", ""]
+    areas = []
+    locations = parse_locations(LOCATIONS_STR) if LOCATIONS_STR else []
+    if locations and index["metadata"]:
+        locator = get_area_locator(index["metadata"])
+        areas.extend(locator.nearest(lat, lon) for lat, lon in locations)
+    areas.extend(AREAS)
+    return list(dict.fromkeys(areas)) or [DEFAULT_AREA]
 
-    if forecast_24h:
-        temp = forecast_24h["temperature"]
-        humidity = forecast_24h["humidity"]
-        lines.append(f"温度: {temp['low']}°C - {temp['high']}°C")
-        lines.append(f"湿度: {humidity['low']}% - {humidity['high']}%")
-        lines.append(f"全天: {forecast_24h['forecast']}")
-        lines.append("")
 
-    if forecast_2h:
-        lines.append(f"<b>{forecast_2h['area']} 近期:</b>")
-        lines.append(f"{forecast_2h['forecast']}")
+def format_weather_message(area: str = None) -> Section:
+    """生成天气段落 (两个接口并发请求，多个区域共用一次下载)"""
+    today = datetime.now().strftime("%Y-%m-%d")
 
-    return "<br>".join(lines)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_2h = executor.submit(fetch_2h_payload)
+        future_24h = executor.submit(get_24h_forecast)
+        data_2h = future_2h.result()
+        forecast_24h = future_24h.result()
 
+    section = Section(items=[Item.heading(f"新加坡天气 - {today}"), Item.blank()])
 
-def run(area: str = None) -> str:
+    if forecast_24h:
+        temp = forecast_24h["temperature"]
+        humidity = forecast_24h["humidity"]
+        section.add(f"温度: {temp['low']}°C - {temp['high']}°C", data=temp)
+        section.add(f"湿度: {humidity['low']}% - {humidity['high']}%", data=humidity)
+        section.add(f"全天: {forecast_24h['forecast']}")
+        section.items.append(Item.blank())
+
+    if data_2h:
+        index = build_area_index(data_2h)
+        shown = set()
+        for name in get_areas(index, area):
+            forecast_2h = lookup_area(index, name)
+            # 不同坐标/名称可能解析到同一区域
+            if forecast_2h and forecast_2h["area"] not in shown:
+                shown.add(forecast_2h["area"])
+                section.items.append(Item.heading(f"{forecast_2h['area']} 近期:"))
+                section.add(forecast_2h["forecast"], data={"area": forecast_2h["area"], "time": forecast_2h["time"]})
+
+    return section
+
+
+def run(area: str = None) -> Section:
     """
-    执行天气查询并返回格式化消息
+    执行天气查询并返回天气段落
 
     Args:
         area: 区域名称，默认使用环境变量 WEATHER_AREA 或 Queenstown
 
     Returns:
-        格式化的天气消息
+        天气段落
     """
     print("=" * 50)
     print("新加坡天气查询")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享 HTTP 客户端
+所有任务和推送渠道共用一个 Session，按主机复用长连接，
+同一主机的 TCP/TLS 握手每次运行只需一次
+"""
+
+import os
+import time
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import metrics, ratelimit, retry
+
+# 默认超时 (秒)
+DEFAULT_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "10"))
+
+# 每个主机保留的长连接数 (多账号并发签到时需要不少于 MIYOUSHE_WORKERS)
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+
+# 默认请求头 (单次请求传入的 headers 会覆盖同名项)
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; DailyTasks/1.0)",
+}
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """获取共享 Session，首次调用时创建"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+                # 不保存响应中的 Cookie，避免多账号之间串号
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def request(method: str, url: str, retry_if=None, **kwargs) -> requests.Response:
+    """
+    通过共享 Session 发送请求
+
+    每次尝试前经过熔断器和限流器；网络错误、5xx 或 retry_if 返回 True 时按退避重试
+
+    Args:
+        method: 请求方法
+        url: 请求地址
+        retry_if: 可选，接收响应并返回是否需要重试 (用于业务 retcode)
+        **kwargs: 透传给 requests 的参数，未指定 timeout 时使用 DEFAULT_TIMEOUT
+
+    Returns:
+        响应对象 (重试耗尽时返回最后一次响应)
+
+    Raises:
+        retry.CircuitOpenError: 接口已熔断
+        requests.RequestException: 重试耗尽后仍然失败
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    breaker = retry.get_breaker(url)
+
+    for attempt in range(retry.MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(retry.backoff_delay(attempt))
+        if not breaker.allow():
+            raise retry.CircuitOpenError(f"接口已熔断: {breaker.name}")
+
+        ratelimit.acquire(url)
+        last_attempt = attempt == retry.MAX_ATTEMPTS - 1
+        started = time.monotonic()
+        try:
+            resp = get_session().request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.record_request(method, url, None, None, 0, time.monotonic() - started, type(e).__name__)
+            breaker.record_failure()
+            if last_attempt:
+                raise
+            continue
+        record_response(method, url, resp, time.monotonic() - started, kwargs.get("stream", False))
+
+        if resp.status_code == 429:
+            ratelimit.penalize(url)
+        if retry.is_retryable_status(resp.status_code):
+            if resp.status_code >= 500:
+                breaker.record_failure()
+            if not last_attempt:
+                resp.close()
+                continue
+            return resp
+
+        breaker.record_success()
+        if retry_if is not None and not last_attempt and retry_if(resp):
+            resp.close()
+            continue
+        return resp
+
+
+def record_response(method: str, url: str, resp: requests.Response, duration: float, stream: bool):
+    """记录响应指标；流式响应不读取正文，字节数取 Content-Length"""
+    if stream:
+        nbytes = int(resp.headers.get("Content-Length") or 0)
+        retcode = None
+    else:
+        nbytes = len(resp.content)
+        retcode = metrics.extract_retcode(resp.content)
+    metrics.record_request(method, url, resp.status_code, retcode, nbytes, duration)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """GET 请求"""
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """POST 请求"""
+    return request("POST", url, **kwargs)
+
+
+def close():
+    """关闭共享 Session 及其连接池"""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
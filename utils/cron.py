@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cron 表达式
+支持标准 5 段 (分 时 日 月 周)，每段可用 *、数字、a-b、逗号列表和 /步长，
+以及 @hourly / @daily / @weekly / @monthly 别名。按本地时间计算，精确到分钟
+"""
+
+from datetime import datetime, timedelta
+
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+# 各段取值范围 (周: 0 和 7 都表示周日)
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+# 向后最多搜索的时长，超过说明表达式不可能匹配 (如 2 月 31 日)
+MAX_LOOKAHEAD = timedelta(days=366 * 5)
+
+
+class CronError(ValueError):
+    """表达式无效"""
+
+
+def _parse_field(text: str, low: int, high: int) -> set:
+    values = set()
+    for part in text.split(","):
+        base, _, step = part.partition("/")
+        try:
+            step = int(step) if step else 1
+            if base == "*":
+                start, end = low, high
+            elif "-" in base:
+                start, end = (int(x) for x in base.split("-", 1))
+            else:
+                start = int(base)
+                end = high if step > 1 else start
+        except ValueError:
+            raise CronError(f"无效的字段: {text}") from None
+        if step < 1 or start < low or end > high or start > end:
+            raise CronError(f"字段超出范围: {text} ({low}-{high})")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpr:
+    """解析后的 cron 表达式"""
+
+    def __init__(self, expr: str):
+        self.expr = expr.strip()
+        fields = ALIASES.get(self.expr, self.expr).split()
+        if len(fields) != 5:
+            raise CronError(f"需要 5 个字段: {expr}")
+
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        # 日和周都被限定时，满足其一即可 (与 crontab 一致)
+        self.days_restricted = fields[2] != "*"
+        self.weekdays_restricted = fields[4] != "*"
+
+    def __repr__(self):
+        return f"CronExpr({self.expr!r})"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def matches(self, dt: datetime) -> bool:
+        """该分钟是否匹配"""
+        return (dt.minute in self.minutes and dt.hour in self.hours
+                and dt.month in self.months and self._day_matches(dt))
+
+    def next_after(self, dt: datetime) -> datetime:
+        """dt 之后 (不含 dt 所在分钟) 的下一个匹配时间"""
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + MAX_LOOKAHEAD
+        while t < limit:
+            if t.month not in self.months:
+                year, month = (t.year + 1, 1) if t.month == 12 else (t.year, t.month + 1)
+                t = t.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise CronError(f"表达式没有匹配的时间: {self.expr}")
+
+
+def parse_schedule(text: str) -> dict:
+    """
+    解析任务计划，如 "miyoushe=5 0 * * *; weather=@hourly; bangumi,conference=0 8 * * *"
+
+    Returns:
+        {任务名: CronExpr}，任务名未校验
+    """
+    schedule = {}
+    for entry in text.split(";"):
+        if not entry.strip():
+            continue
+        names, sep, expr = entry.partition("=")
+        if not sep:
+            raise CronError(f"缺少 '=': {entry.strip()}")
+        cron = CronExpr(expr)
+        for name in names.split(","):
+            if name.strip():
+                schedule[name.strip().lower()] = cron
+    return schedule
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+条件 GET 磁盘缓存
+保存响应正文及其 ETag/Last-Modified，再次请求时带 If-None-Match/If-Modified-Since，
+304 时直接读磁盘；上游不可用时返回过期内容。总大小超过上限时按最近使用时间淘汰
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from utils import client, store
+
+# 缓存总大小上限 (字节)
+MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# 流式下载的分块大小
+CHUNK_SIZE = 64 * 1024
+
+_lock = threading.Lock()
+
+
+class CachedResponse:
+    """缓存或网络返回的响应正文"""
+
+    __slots__ = ("url", "content", "from_cache", "stale")
+
+    def __init__(self, url: str, content: bytes, from_cache: bool = False, stale: bool = False):
+        self.url = url
+        self.content = content
+        self.from_cache = from_cache  # 304 命中或上游失败时读自磁盘
+        self.stale = stale            # 上游失败，内容可能过期
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class LineStream:
+    """
+    按行迭代的响应正文
+
+    创建时已完成条件请求；sha256 为正文哈希，从网络下载时在迭代结束后才可用
+    """
+
+    __slots__ = ("url", "from_cache", "stale", "sha256", "_lines")
+
+    def __init__(self, url: str, from_cache: bool = False, stale: bool = False, sha256: str = None):
+        self.url = url
+        self.from_cache = from_cache
+        self.stale = stale
+        self.sha256 = sha256
+        self._lines = iter(())
+
+    def __iter__(self):
+        return self._lines
+
+
+def _paths(url: str):
+    key = hashlib.sha1(url.encode()).hexdigest()
+    return store.cache_path("http", f"{key}.body"), store.cache_path("http", f"{key}.meta.json")
+
+
+def _read_body(body_path: str):
+    try:
+        with open(body_path, "rb") as f:
+            content = f.read()
+        # 更新修改时间作为最近使用时间
+        os.utime(body_path)
+        return content
+    except OSError:
+        return None
+
+
+def _save_meta(url: str, resp, size: int, sha256: str):
+    """保存校验信息并检查缓存总大小"""
+    _, meta_path = _paths(url)
+    store.save_json(meta_path, {
+        "url": url,
+        "etag": resp.headers.get("ETag", ""),
+        "last_modified": resp.headers.get("Last-Modified", ""),
+        "stored_at": int(time.time()),
+        "size": size,
+        "sha256": sha256,
+    })
+    evict()
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save(url: str, resp):
+    """保存 200 响应的正文和校验信息"""
+    body_path, _ = _paths(url)
+    try:
+        with open(body_path + ".tmp", "wb") as f:
+            f.write(resp.content)
+        os.replace(body_path + ".tmp", body_path)
+    except OSError as e:
+        print(f"写入HTTP缓存异常: {e}")
+        return
+    _save_meta(url, resp, len(resp.content), hashlib.sha256(resp.content).hexdigest())
+
+
+def _conditional_headers(meta, headers) -> dict:
+    """在请求头中加入条件请求字段"""
+    headers = dict(headers or {})
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def evict(max_bytes: int = None):
+    """总大小超过上限时，按最近使用时间从旧到新删除"""
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    directory = os.path.join(store.CACHE_DIR, "http")
+    with _lock:
+        try:
+            entries = []
+            for name in os.listdir(directory):
+                if name.endswith(".body"):
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            store.remove(path)
+            store.remove(path[:-len(".body")] + ".meta.json")
+            total -= size
+
+
+def get(url: str, **kwargs) -> CachedResponse:
+    """
+    带条件请求的 GET
+
+    Args:
+        url: 请求地址
+        **kwargs: 透传给 client.get 的参数
+
+    Returns:
+        CachedResponse
+
+    Raises:
+        上游失败且没有缓存时抛出原异常
+    """
+    body_path, meta_path = _paths(url)
+    meta = store.load_json(meta_path) if os.path.exists(body_path) else None
+
+    headers = _conditional_headers(meta, kwargs.pop("headers", None))
+
+    try:
+        resp = client.get(url, headers=headers, **kwargs)
+    except Exception as e:
+        content = _read_body(body_path) if meta else None
+        if content is None:
+            raise
+        print(f"请求失败，使用缓存内容: {url} ({e})")
+        return CachedResponse(url, content, from_cache=True, stale=True)
+
+    if resp.status_code == 304 and meta:
+        content = _read_body(body_path)
+        if content is not None:
+            return CachedResponse(url, content, from_cache=True)
+        # 缓存文件丢失，去掉条件头重新请求
+        return get(url, **kwargs)
+
+    if resp.status_code == 200:
+        _save(url, resp)
+        return CachedResponse(url, resp.content)
+
+    content = _read_body(body_path) if meta else None
+    if content is not None:
+        print(f"请求返回 {resp.status_code}，使用缓存内容: {url}")
+        return CachedResponse(url, content, from_cache=True, stale=True)
+    resp.raise_for_status()
+    return CachedResponse(url, resp.content)
+
+
+def _iter_file_lines(body_path: str):
+    """逐行读取缓存文件"""
+    with open(body_path, encoding="utf-8", errors="replace", newline="") as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+
+def _iter_stream_lines(url: str, resp, body_path: str, stream: LineStream):
+    """边下载边按行产出，同时写入缓存并计算哈希；下载完整后才替换旧缓存"""
+    tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    buffer = b""
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+        if buffer:
+            yield buffer.rstrip(b"\r").decode("utf-8", errors="replace")
+        os.replace(tmp_path, body_path)
+        stream.sha256 = digest.hexdigest()
+        _save_meta(url, resp, size, stream.sha256)
+    finally:
+        resp.close()
+        store.remove(tmp_path)
+
+
+def _cached_stream(url: str, body_path: str, meta: dict, stale: bool) -> LineStream:
+    os.utime(body_path)
+    sha256 = meta.get("sha256") or _file_sha256(body_path)
+    stream = LineStream(url, from_cache=True, stale=stale, sha256=sha256)
+    stream._lines = _iter_file_lines(body_path)
+    return stream
+
+
+def iter_lines(url: str, **kwargs) -> LineStream:
+    """
+    带条件请求的流式 GET，返回逐行迭代正文 (不含换行符) 的 LineStream
+
+    200 时边下载边产出并写入缓存；304 或上游失败时逐行读取缓存文件，
+    内存占用与文件大小无关。内容未变化时可以先比较 sha256 再决定是否迭代
+
+    Raises:
+        上游失败且没有缓存时抛出原异常；下载中途断开时迭代抛出异常 (已产出的行无法撤回)
+    """
+    body_path, meta_path = _paths(url)
+    meta = store.load_json(meta_path) if os.path.exists(body_path) else None
+    headers = _conditional_headers(meta, kwargs.pop("headers", None))
+
+    try:
+        resp = client.get(url, headers=headers, stream=True, **kwargs)
+    except Exception as e:
+        if not meta:
+            raise
+        print(f"请求失败，使用缓存内容: {url} ({e})")
+        return _cached_stream(url, body_path, meta, stale=True)
+
+    if resp.status_code == 200:
+        stream = LineStream(url)
+        stream._lines = _iter_stream_lines(url, resp, body_path, stream)
+        return stream
+
+    resp.close()
+    if meta:
+        if resp.status_code != 304:
+            print(f"请求返回 {resp.status_code}，使用缓存内容: {url}")
+        return _cached_stream(url, body_path, meta, stale=resp.status_code != 304)
+    resp.raise_for_status()
+    return LineStream(url)
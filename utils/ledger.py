@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+签到台账 (SQLite)
+记录每个角色每天的签到结果，重复运行时跳过已签到角色的网络请求
+"""
+
+import sqlite3
+import calendar
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from utils import store
+
+# 签到按北京时间零点刷新
+SIGN_TZ = timezone(timedelta(hours=8))
+
+# 结果类型
+RESULT_SIGNED = "signed"    # 本次签到成功
+RESULT_ALREADY = "already"  # 查询时已签到
+RESULT_FAILED = "failed"    # 签到失败
+
+# 视为当日已完成的结果
+DONE_RESULTS = (RESULT_SIGNED, RESULT_ALREADY)
+
+_conn = None
+_lock = threading.Lock()
+
+
+def today() -> str:
+    """北京时间的今天 (YYYY-MM-DD)"""
+    return datetime.now(SIGN_TZ).strftime("%Y-%m-%d")
+
+
+def _get_conn() -> sqlite3.Connection:
+    """获取数据库连接 (调用方需持有 _lock)"""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(store.cache_path("ledger.db"), check_same_thread=False)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sign_ledger (
+                uid TEXT NOT NULL,
+                act_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                result TEXT NOT NULL,
+                total_sign_day INTEGER NOT NULL DEFAULT 0,
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (uid, act_id, date)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sign_ledger_uid_date ON sign_ledger (uid, date)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def get_signed(uid: str, act_id: str, date: str = None):
+    """
+    查询角色当天是否已签到
+
+    Returns:
+        (是否已签到, 本月累计天数)
+    """
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT result, total_sign_day FROM sign_ledger WHERE uid = ? AND act_id = ? AND date = ?",
+            (uid, act_id, date or today()),
+        ).fetchone()
+    if row and row[0] in DONE_RESULTS:
+        return True, row[1]
+    return False, 0
+
+
+def record(uid: str, act_id: str, result: str, total_sign_day: int, date: str = None):
+    """记录签到结果 (同一天重复记录时覆盖)"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO sign_ledger (uid, act_id, date, result, total_sign_day, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (uid, act_id, date or today(), result, total_sign_day, int(time.time())),
+        )
+        conn.commit()
+
+
+def missed_days(uid: str, act_id: str, year: int, month: int) -> list:
+    """
+    查询某月漏签的日期 (只统计到今天为止)
+
+    Returns:
+        漏签日期列表 (YYYY-MM-DD)
+    """
+    month_prefix = f"{year:04d}-{month:02d}-"
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT date FROM sign_ledger WHERE uid = ? AND act_id = ? AND date >= ? AND date < ? "
+            "AND result IN (?, ?)",
+            (uid, act_id, month_prefix + "01", month_prefix + "32") + DONE_RESULTS,
+        ).fetchall()
+    done = {row[0] for row in rows}
+
+    last_day = calendar.monthrange(year, month)[1]
+    end = min(f"{month_prefix}{last_day:02d}", today())
+    missed = []
+    for day in range(1, last_day + 1):
+        date = f"{month_prefix}{day:02d}"
+        if date > end:
+            break
+        if date not in done:
+            missed.append(date)
+    return missed
+
+
+def close():
+    """关闭数据库连接"""
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多关键词匹配
+标题归一化 (大小写、全半角、标点、常见繁简异体字) + Aho-Corasick 自动机，
+一次扫描即可判断文本是否包含任一关键词，耗时与关键词数量无关
+"""
+
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+# 常见繁体/异体字 -> 简体 (番剧标题中出现较多的字)
+CJK_VARIANTS = str.maketrans(
+    "們與傳劍戰無語說間開關東車門見長時會來後從發學動國機體電樂錄號記戀愛貓龍鬥獸"
+    "靈術陣異貳參碼聖騎擊歸遊戲歲黃進書圖島燈對將專導屬層場頭畫這還邊變處陽陰寫當點熱齒齡聲聽讀"
+    "蓮滅獵偵紅藍綠銀鋼鍊萬個",
+    "们与传剑战无语说间开关东车门见长时会来后从发学动国机体电乐录号记恋爱猫龙斗兽"
+    "灵术阵异贰参码圣骑击归游戏岁黄进书图岛灯对将专导属层场头画这还边变处阳阴写当点热齿龄声听读"
+    "莲灭猎侦红蓝绿银钢炼万个",
+)
+
+
+def normalize(text: str) -> str:
+    """
+    归一化标题用于匹配
+
+    NFKC (全角转半角)、casefold、繁简异体字转换，并去掉标点、符号和空白
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold().translate(CJK_VARIANTS)
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in "PSZC")
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式匹配自动机"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [False]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(False)
+            node = nxt
+        self.output[node] = True
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                fallback = self.goto[state].get(ch, 0)
+                self.fail[child] = fallback if fallback != child else 0
+                # 后缀也是关键词时，到达 child 即算命中
+                self.output[child] = self.output[child] or self.output[self.fail[child]]
+
+    def contains_any(self, text: str) -> bool:
+        """文本中是否包含任一关键词"""
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                return True
+        return False
+
+
+@lru_cache(maxsize=32)
+def get_matcher(keywords: tuple) -> AhoCorasick:
+    """按关键词列表构建 (并缓存) 归一化后的匹配器"""
+    return AhoCorasick(normalize(keyword) for keyword in keywords)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+记录每个 HTTP 请求 (主机、接口、状态码/retcode、字节数、耗时) 和每个任务的耗时，
+运行结束时写出 JSON 文件和 Prometheus textfile collector 文件
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from urllib.parse import urlsplit
+
+# 指标输出目录，设为空字符串则不写文件
+METRICS_DIR = os.environ.get("METRICS_DIR", "metrics")
+
+# Prometheus 指标名前缀
+PROM_PREFIX = "daily_tasks"
+
+# 响应开头的业务状态码 (米游社 retcode、企业微信 errcode、PushPlus code)
+RETCODE_RE = re.compile(rb'"(?:retcode|errcode|code)"\s*:\s*(-?\d+)')
+
+# 路径中的密钥 (Telegram Bot Token)
+SECRET_PATH_RE = re.compile(r"/bot[^/]+")
+
+# 路径中的纯数字段 (如番剧 ID)，归并为同一个接口
+ID_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+
+# 文本 (如异常信息) 中的密钥：Telegram Bot Token 和 webhook key/token 查询参数
+SECRET_TEXT_RE = re.compile(r"(/bot)[^/\s]*:[^/\s]+|([?&](?:key|token|access_token)=)[^&\s'\"]+")
+
+_requests = []
+_tasks = {}
+_values = {}
+_lock = threading.Lock()
+
+
+def get_endpoint(url: str):
+    """返回 (主机, 脱敏并把数字 ID 段替换为 {id} 后的路径)"""
+    parts = urlsplit(url)
+    path = ID_SEGMENT_RE.sub("/{id}", SECRET_PATH_RE.sub("/bot***", parts.path))
+    return parts.netloc, path or "/"
+
+
+def redact(text: str) -> str:
+    """去掉文本中 URL 携带的密钥"""
+    return SECRET_TEXT_RE.sub(lambda m: (m.group(1) or m.group(2)) + "***", text)
+
+
+def extract_retcode(content: bytes):
+    """从响应开头提取业务状态码，没有则返回 None"""
+    match = RETCODE_RE.search(content[:256])
+    return int(match.group(1)) if match else None
+
+
+def record_request(method: str, url: str, status, retcode, nbytes: int, duration: float, error: str = ""):
+    """记录一次 HTTP 请求 (每次重试单独记录)"""
+    host, endpoint = get_endpoint(url)
+    with _lock:
+        _requests.append({
+            "method": method,
+            "host": host,
+            "endpoint": endpoint,
+            "status": status,
+            "retcode": retcode,
+            "bytes": nbytes,
+            "duration": round(duration, 4),
+            "error": error,
+        })
+
+
+def record_task(name: str, duration: float, status: str):
+    """记录任务耗时；已判定超时的任务不会被之后的完成结果覆盖"""
+    with _lock:
+        if _tasks.get(name, {}).get("status") == "timeout":
+            return
+        _tasks[name] = {"duration": round(duration, 4), "status": status}
+
+
+def record_values(task: str, values: dict):
+    """记录任务结果中的数值 (如签到成功数)"""
+    with _lock:
+        _values.setdefault(task, {}).update(values)
+
+
+def snapshot() -> dict:
+    """返回当前所有指标"""
+    with _lock:
+        reqs = list(_requests)
+        tasks = {name: dict(data) for name, data in _tasks.items()}
+        values = {name: dict(data) for name, data in _values.items()}
+
+    endpoints = {}
+    for req in reqs:
+        key = f"{req['host']}{req['endpoint']}"
+        summary = endpoints.setdefault(key, {"count": 0, "errors": 0, "bytes": 0, "total": 0.0, "max": 0.0})
+        summary["count"] += 1
+        summary["bytes"] += req["bytes"]
+        summary["total"] = round(summary["total"] + req["duration"], 4)
+        summary["max"] = max(summary["max"], req["duration"])
+        if req["error"] or (req["status"] or 0) >= 400:
+            summary["errors"] += 1
+
+    return {
+        "generated_at": int(time.time()),
+        "tasks": tasks,
+        "values": values,
+        "endpoints": endpoints,
+        "requests": reqs,
+    }
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def format_prometheus(data: dict) -> str:
+    """按 Prometheus 文本格式输出"""
+    p = PROM_PREFIX
+    counts = {}
+    durations = {}
+    sizes = {}
+    for req in data["requests"]:
+        status = req["status"] if req["status"] is not None else "error"
+        count_key = (req["host"], req["endpoint"], str(status), "" if req["retcode"] is None else str(req["retcode"]))
+        counts[count_key] = counts.get(count_key, 0) + 1
+        endpoint_key = (req["host"], req["endpoint"])
+        total, n = durations.get(endpoint_key, (0.0, 0))
+        durations[endpoint_key] = (total + req["duration"], n + 1)
+        sizes[endpoint_key] = sizes.get(endpoint_key, 0) + req["bytes"]
+
+    lines = [
+        f"# HELP {p}_http_requests_total HTTP requests by endpoint, status and retcode.",
+        f"# TYPE {p}_http_requests_total counter",
+    ]
+    for (host, endpoint, status, retcode), n in sorted(counts.items()):
+        lines.append(f"{p}_http_requests_total"
+                     f"{_labels(host=host, endpoint=endpoint, status=status, retcode=retcode)} {n}")
+
+    lines += [
+        f"# HELP {p}_http_request_duration_seconds HTTP request duration.",
+        f"# TYPE {p}_http_request_duration_seconds summary",
+    ]
+    for (host, endpoint), (total, n) in sorted(durations.items()):
+        labels = _labels(host=host, endpoint=endpoint)
+        lines.append(f"{p}_http_request_duration_seconds_sum{labels} {total:.4f}")
+        lines.append(f"{p}_http_request_duration_seconds_count{labels} {n}")
+
+    lines += [
+        f"# HELP {p}_http_response_bytes_total HTTP response body bytes.",
+        f"# TYPE {p}_http_response_bytes_total counter",
+    ]
+    for (host, endpoint), n in sorted(sizes.items()):
+        lines.append(f"{p}_http_response_bytes_total{_labels(host=host, endpoint=endpoint)} {n}")
+
+    lines += [
+        f"# HELP {p}_task_duration_seconds Wall time per task.",
+        f"# TYPE {p}_task_duration_seconds gauge",
+    ]
+    for name, task in sorted(data["tasks"].items()):
+        lines.append(f"{p}_task_duration_seconds{_labels(task=name, status=task['status'])} {task['duration']:.4f}")
+
+    lines += [
+        f"# HELP {p}_task_value Values reported by task results.",
+        f"# TYPE {p}_task_value gauge",
+    ]
+    for task, values in sorted(data.get("values", {}).items()):
+        for name, value in sorted(values.items()):
+            lines.append(f"{p}_task_value{_labels(task=task, name=name)} {value}")
+
+    lines += [
+        f"# HELP {p}_last_run_timestamp_seconds Time the metrics were written.",
+        f"# TYPE {p}_last_run_timestamp_seconds gauge",
+        f"{p}_last_run_timestamp_seconds {data['generated_at']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write(directory: str = None):
+    """写出 metrics.json 和 daily_tasks.prom"""
+    directory = METRICS_DIR if directory is None else directory
+    if not directory:
+        return
+
+    data = snapshot()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "metrics.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        # textfile collector 要求原子替换，避免读到写了一半的文件
+        prom_path = os.path.join(directory, f"{PROM_PREFIX}.prom")
+        with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(format_prometheus(data))
+        os.replace(prom_path + ".tmp", prom_path)
+        print(f"指标已写入: {directory}")
+    except OSError as e:
+        print(f"写入指标异常: {e}")
+
+
+def reset():
+    """清空已记录的指标"""
+    with _lock:
+        _requests.clear()
+        _tasks.clear()
+        _values.clear()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务结果模型
+任务返回结构化的 Section，由 utils.render 按渠道渲染成 HTML / Markdown / JSON，
+outbox、指标等也直接使用这些数据而不用解析文本
+"""
+
+import re
+import json
+
+# 旧式任务返回的整行 <b>/<small> 标签
+LEGACY_LINE_RE = re.compile(r"^<(b|small)>(.*)</\1>$")
+
+
+class Status:
+    """段落 (任务) 的执行状态"""
+
+    __slots__ = ("code", "detail")
+
+    OK = "ok"
+    WARN = "warn"
+    ERROR = "error"
+    TIMEOUT = "timeout"
+
+    def __init__(self, code: str = OK, detail=None):
+        self.code = code
+        self.detail = detail  # 异常信息或超时预算 (秒)
+
+    @property
+    def ok(self) -> bool:
+        return self.code == Status.OK
+
+    def to_dict(self) -> dict:
+        return {"code": self.code, "detail": self.detail}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Status":
+        return cls(data.get("code", cls.OK), data.get("detail"))
+
+
+class Metric:
+    """段落附带的数值，如签到成功数"""
+
+    __slots__ = ("name", "value", "unit")
+
+    def __init__(self, name: str, value, unit: str = ""):
+        self.name = name
+        self.value = value
+        self.unit = unit
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "value": self.value, "unit": self.unit}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Metric":
+        return cls(data["name"], data["value"], data.get("unit", ""))
+
+
+class Item:
+    """
+    段落中的一行
+
+    kind 决定渲染方式: text 普通行，heading 加粗标题，bullet 列表项 (• 开头)，
+    detail 列表项的补充说明，note 小字备注，blank 空行。
+    label 会加粗显示在 text 前面
+    """
+
+    __slots__ = ("text", "kind", "label", "status", "data")
+
+    TEXT = "text"
+    HEADING = "heading"
+    BULLET = "bullet"
+    DETAIL = "detail"
+    NOTE = "note"
+    BLANK = "blank"
+
+    def __init__(self, text: str = "", kind: str = TEXT, label: str = "", status: str = None, data: dict = None):
+        self.text = text
+        self.kind = kind
+        self.label = label
+        self.status = status  # Status.OK / WARN / ERROR，None 表示不适用
+        self.data = data      # 供下游使用的原始数据
+
+    @classmethod
+    def heading(cls, text: str, **kwargs) -> "Item":
+        return cls(text, cls.HEADING, **kwargs)
+
+    @classmethod
+    def bullet(cls, text: str, **kwargs) -> "Item":
+        return cls(text, cls.BULLET, **kwargs)
+
+    @classmethod
+    def detail(cls, text: str, **kwargs) -> "Item":
+        return cls(text, cls.DETAIL, **kwargs)
+
+    @classmethod
+    def note(cls, text: str, **kwargs) -> "Item":
+        return cls(text, cls.NOTE, **kwargs)
+
+    @classmethod
+    def blank(cls) -> "Item":
+        return cls("", cls.BLANK)
+
+    def to_dict(self) -> dict:
+        data = {"text": self.text, "kind": self.kind}
+        for key in ("label", "status", "data"):
+            value = getattr(self, key)
+            if value:
+                data[key] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Item":
+        return cls(data.get("text", ""), data.get("kind", cls.TEXT), data.get("label", ""),
+                   data.get("status"), data.get("data"))
+
+
+class Section:
+    """一个任务的报告段落"""
+
+    __slots__ = ("key", "title", "items", "status", "metrics")
+
+    def __init__(self, key: str = "", title: str = "", items: list = None, status: Status = None,
+                 metrics: list = None):
+        self.key = key          # 任务名
+        self.title = title      # 报告标题，由 main 按任务注册表填写
+        self.items = items if items is not None else []
+        self.status = status or Status()
+        self.metrics = metrics if metrics is not None else []
+
+    @property
+    def empty(self) -> bool:
+        """执行成功但没有内容 (不出现在报告中)"""
+        return self.status.ok and not self.items
+
+    def add(self, text: str = "", kind: str = Item.TEXT, **kwargs) -> Item:
+        """追加一行并返回"""
+        item = Item(text, kind, **kwargs)
+        self.items.append(item)
+        return item
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "title": self.title,
+            "status": self.status.to_dict(),
+            "items": [item.to_dict() for item in self.items],
+            "metrics": [metric.to_dict() for metric in self.metrics],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Section":
+        return cls(
+            data.get("key", ""),
+            data.get("title", ""),
+            [Item.from_dict(item) for item in data.get("items", [])],
+            Status.from_dict(data.get("status", {})),
+            [Metric.from_dict(metric) for metric in data.get("metrics", [])],
+        )
+
+
+def as_section(result) -> Section:
+    """
+    把任务返回值转成 Section
+
+    兼容旧式任务：字符串按 <br> 分行，列表每个元素一行；
+    整行 <b>/<small> 分别转为 heading/note
+    """
+    if isinstance(result, Section):
+        return result
+    if not result:
+        return Section()
+    lines = result.split("<br>") if isinstance(result, str) else [str(line) for line in result]
+    items = []
+    for line in lines:
+        match = LEGACY_LINE_RE.match(line)
+        if not line:
+            items.append(Item.blank())
+        elif match:
+            items.append(Item(match.group(2), Item.HEADING if match.group(1) == "b" else Item.NOTE))
+        else:
+            items.append(Item(line))
+    return Section(items=items)
+
+
+def loads(text: str):
+    """
+    解析 render.to_json 的输出
+
+    Returns:
+        Section 列表；不是该格式时 (如旧版 outbox 中的 HTML) 原样返回字符串
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text
+    if not isinstance(data, dict) or "sections" not in data:
+        return text
+    return [Section.from_dict(section) for section in data["sections"]]
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推送发件箱 (SQLite)
+报告推送前先写入，渠道推送成功后标记完成；未送达的报告在下次运行开始时
+(或 python main.py --drain) 补发，同一报告按 report_id 去重
+"""
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+
+from utils import store
+
+# 回退模式下一条报告只需任一渠道送达，用 "*" 表示
+ANY_CHANNEL = "*"
+
+# 单条记录最多尝试次数 (含首次推送)
+MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "5"))
+
+# 超过该时长 (秒) 仍未送达的报告不再补发
+MAX_AGE = int(os.environ.get("OUTBOX_MAX_AGE", str(3 * 86400)))
+
+# 已完成/过期记录的保留时长 (秒)
+RETENTION = 7 * 86400
+
+# 认领后超过该时长 (秒) 仍未完成的记录视为推送中断，可以重新认领
+CLAIM_TIMEOUT = int(os.environ.get("OUTBOX_CLAIM_TIMEOUT", "600"))
+
+# 状态
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"  # 已被 deliver 或补发认领，正在推送
+STATUS_DONE = "done"
+
+# 可被补发认领的记录 (参数: 待推送状态、推送中状态、认领过期时间、最大尝试次数、最早写入时间)
+_CLAIMABLE = (
+    "(status = ? OR (status = ? AND updated_at < ?)) AND attempts < ? AND created_at >= ?"
+)
+
+_conn = None
+_lock = threading.Lock()
+
+
+def make_report_id(title: str, content: str) -> str:
+    """报告 ID: 日期 + 内容哈希，同一天重复运行得到相同内容时视为同一报告"""
+    digest = hashlib.sha256(f"{title}\n{content}".encode("utf-8")).hexdigest()[:16]
+    return f"{datetime.now().strftime('%Y%m%d')}-{digest}"
+
+
+def _get_conn() -> sqlite3.Connection:
+    """获取数据库连接 (调用方需持有 _lock)"""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(store.cache_path("outbox.db"), check_same_thread=False)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                report_id TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                template TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (report_id, channel)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status, created_at)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def enqueue(report_id: str, title: str, content: str, template: str, channels: list) -> list:
+    """
+    写入待推送记录，已存在的 (report_id, channel) 不会重复写入
+
+    新记录直接处于推送中状态 (由调用方认领)，补发不会同时推送它们
+
+    Returns:
+        新写入的渠道列表
+    """
+    now = int(time.time())
+    added = []
+    with _lock:
+        conn = _get_conn()
+        for channel in channels:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO outbox "
+                "(report_id, channel, title, content, template, status, attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (report_id, channel, title, content, template, STATUS_SENDING, now, now),
+            )
+            if cursor.rowcount:
+                added.append(channel)
+        conn.commit()
+    return added
+
+
+def mark_done(report_id: str, channel: str):
+    """标记送达"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "UPDATE outbox SET status = ?, attempts = attempts + 1, last_error = NULL, updated_at = ? "
+            "WHERE report_id = ? AND channel = ?",
+            (STATUS_DONE, int(time.time()), report_id, channel),
+        )
+        conn.commit()
+
+
+def mark_failed(report_id: str, channel: str, error: str):
+    """记录一次失败的尝试，释放认领留待补发"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "UPDATE outbox SET status = ?, attempts = attempts + 1, last_error = ?, updated_at = ? "
+            "WHERE report_id = ? AND channel = ?",
+            (STATUS_PENDING, error, int(time.time()), report_id, channel),
+        )
+        conn.commit()
+
+
+def get_states(report_id: str) -> dict:
+    """
+    报告各渠道记录的状态
+
+    Returns:
+        {渠道: {"status", "attempts", "last_error"}}
+    """
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT channel, status, attempts, last_error FROM outbox WHERE report_id = ?",
+            (report_id,),
+        ).fetchall()
+    return {
+        channel: {"status": status, "attempts": attempts, "last_error": last_error}
+        for channel, status, attempts, last_error in rows
+    }
+
+
+def _claimable_params(now: int) -> tuple:
+    return (STATUS_PENDING, STATUS_SENDING, now - CLAIM_TIMEOUT, MAX_ATTEMPTS, now - MAX_AGE)
+
+
+def pending(limit: int = 20) -> list:
+    """
+    待补发的记录 (未超过尝试次数和有效期，且没有正在推送)，按写入时间排序
+
+    Returns:
+        [{"report_id", "channel", "title", "content", "template", "attempts"}, ...]
+    """
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT report_id, channel, title, content, template, attempts FROM outbox "
+            f"WHERE {_CLAIMABLE} ORDER BY created_at, report_id LIMIT ?",
+            (*_claimable_params(int(time.time())), limit),
+        ).fetchall()
+    keys = ("report_id", "channel", "title", "content", "template", "attempts")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def claim(limit: int = 20) -> list:
+    """
+    认领待补发的记录 (标记为推送中)，同一记录不会被两个补发或 deliver 同时推送
+
+    Returns:
+        认领成功的记录，格式同 pending()
+    """
+    claimed = []
+    for row in pending(limit):
+        now = int(time.time())
+        with _lock:
+            conn = _get_conn()
+            cursor = conn.execute(
+                "UPDATE outbox SET status = ?, updated_at = ? "
+                f"WHERE report_id = ? AND channel = ? AND {_CLAIMABLE}",
+                (STATUS_SENDING, now, row["report_id"], row["channel"], *_claimable_params(now)),
+            )
+            conn.commit()
+        if cursor.rowcount:
+            claimed.append(row)
+    return claimed
+
+
+def has_pending() -> bool:
+    """是否有待补发的记录 (数据库不存在时不创建)"""
+    if _conn is None and not os.path.exists(os.path.join(store.CACHE_DIR, "outbox.db")):
+        return False
+    return bool(pending(limit=1))
+
+
+def prune():
+    """删除保留期之外的已完成和过期记录"""
+    now = int(time.time())
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "DELETE FROM outbox WHERE (status = ? AND updated_at < ?) OR created_at < ?",
+            (STATUS_DONE, now - RETENTION, now - MAX_AGE - RETENTION),
+        )
+        conn.commit()
+
+
+def close():
+    """关闭数据库连接"""
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
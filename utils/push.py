@@ -3,11 +3,14 @@
 """
 推送通知模块
 支持：Telegram、企业微信群机器人、PushPlus
+已配置的渠道并发推送 (或按优先级依次回退)，每个渠道有独立的超时
 """
 
 import os
-import re
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from utils import client, metrics, model, outbox, render
 
 # Telegram Bot
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
@@ -19,154 +22,321 @@ WECOM_WEBHOOK = os.environ.get("WECOM_WEBHOOK", "")
 # PushPlus Token (备用)
 PUSHPLUS_TOKEN = os.environ.get("PUSHPLUS_TOKEN", "")
 
+# 推送模式: all (所有已配置渠道并发推送) / fallback (按优先级推送，失败才尝试下一个)
+PUSH_MODE = os.environ.get("PUSH_MODE", "all").lower()
+
+# 每个渠道的超时 (秒)，可用 PUSH_TIMEOUT_<渠道名> 单独覆盖
+DEFAULT_PUSH_TIMEOUT = float(os.environ.get("PUSH_TIMEOUT", "20"))
+
+# 每次运行最多补发的 outbox 记录数
+OUTBOX_BATCH = int(os.environ.get("OUTBOX_BATCH", "20"))
+
+# API 地址
+TELEGRAM_API = "https://api.telegram.org"
+PUSHPLUS_URL = "http://www.pushplus.plus/send"
+
 
 def html_to_markdown(html: str) -> str:
     """Convert simple HTML to Markdown"""
-    text = html
-    text = re.sub(r'<b>(.*?)</b>', r'**\1**', text)
-    text = re.sub(r'<br\s*/?>', '\n', text)
-    text = re.sub(r'<[^>]+>', '', text)
-    return text
+    return render.html_to_markdown(html)
 
 
-def push_telegram(title: str, content: str) -> bool:
-    """
-    Telegram Bot 推送
+class PushError(Exception):
+    """渠道返回失败"""
 
-    Args:
-        title: 消息标题
-        content: 消息内容 (HTML格式会转换为Markdown)
 
-    Returns:
-        是否推送成功
-    """
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-        return False
+# content 为 Section 列表 (或旧式 HTML 字符串)，每个渠道各渲染一次。
+# 超过长度上限的报告会拆成多条消息，在同一个保持连接上按顺序发送；
+# 某一条失败时不再发送后面的部分，避免消息顺序错乱
+
+
+def _send_telegram(title: str, content, template: str):
+    url = f"{TELEGRAM_API}/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    for message in render.render_messages("telegram", title, content):
+        data = {
+            "chat_id": TELEGRAM_CHAT_ID,
+            "text": message,
+            "parse_mode": "Markdown"
+        }
+
+        result = client.post(url, json=data).json()
+        if not result.get("ok"):
+            raise PushError(result)
+
+
+def _send_wecom(title: str, content, template: str):
+    for message in render.render_messages("wecom", title, content):
+        data = {
+            "msgtype": "markdown",
+            "markdown": {
+                "content": message
+            }
+        }
+
+        result = client.post(WECOM_WEBHOOK, json=data).json()
+        if result.get("errcode") != 0:
+            raise PushError(result)
 
-    # Convert HTML to Markdown
-    md_content = html_to_markdown(content)
-    message = f"*{title}*\n\n{md_content}"
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+def _send_pushplus(title: str, content, template: str):
+    if not isinstance(content, str):
+        if template == "json":
+            content = render.to_json(content)
+        elif template in ("markdown", "txt"):
+            content = render.to_markdown(content)
+        else:
+            content = render.to_html(content)
+
     data = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "Markdown"
+        "token": PUSHPLUS_TOKEN,
+        "title": title,
+        "content": content,
+        "template": template
     }
 
+    result = client.post(PUSHPLUS_URL, json=data).json()
+    if result.get("code") != 200:
+        raise PushError(result)
+
+
+# 渠道: (名称, 显示名, 是否已配置, 发送函数)，顺序即回退模式的优先级
+CHANNELS = [
+    ("telegram", "Telegram", lambda: bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID), _send_telegram),
+    ("wecom", "企业微信", lambda: bool(WECOM_WEBHOOK), _send_wecom),
+    ("pushplus", "PushPlus", lambda: bool(PUSHPLUS_TOKEN), _send_pushplus),
+]
+
+
+def get_channels() -> list:
+    """已配置的渠道名，按优先级排列"""
+    return [name for name, _, configured, _ in CHANNELS if configured()]
+
+
+def get_push_timeout(channel: str) -> float:
+    """读取渠道的超时"""
+    return float(os.environ.get(f"PUSH_TIMEOUT_{channel.upper()}", DEFAULT_PUSH_TIMEOUT))
+
+
+def _deliver(channel: str, title: str, content, template: str) -> dict:
+    """调用单个渠道，返回 {"ok", "elapsed", "error"}"""
+    _, label, _, send = next(c for c in CHANNELS if c[0] == channel)
+    started = time.monotonic()
+    error = None
     try:
-        resp = requests.post(url, json=data, timeout=10)
-        result = resp.json()
-        if result.get("ok"):
-            print(f"Telegram推送成功: {title}")
-            return True
-        else:
-            print(f"Telegram推送失败: {result}")
-            return False
+        send(title, content, template)
+        print(f"{label}推送成功: {title}")
+    except PushError as e:
+        error = metrics.redact(str(e))
+        print(f"{label}推送失败: {error}")
     except Exception as e:
-        print(f"Telegram推送异常: {e}")
-        return False
+        error = f"{type(e).__name__}: {metrics.redact(str(e))}"
+        print(f"{label}推送异常: {error}")
+    elapsed = time.monotonic() - started
+    metrics.record_task(f"push_{channel}", elapsed, "error" if error else "ok")
+    return {"ok": error is None, "elapsed": round(elapsed, 3), "error": error}
+
+
+def _timeout_report(channel: str, timeout: float) -> dict:
+    label = next(c[1] for c in CHANNELS if c[0] == channel)
+    print(f"{label}推送超时 ({timeout:g}s)")
+    metrics.record_task(f"push_{channel}", timeout, "timeout")
+    return {"ok": False, "elapsed": timeout, "error": "timeout"}
 
 
-def push_wecom(title: str, content: str) -> bool:
+def dispatch(title: str, content, template: str = "html", mode: str = None,
+             channels: list = None) -> dict:
     """
-    企业微信群机器人推送
+    推送到已配置的渠道
 
     Args:
         title: 消息标题
-        content: 消息内容 (HTML格式会转换为Markdown)
+        content: Section 列表，或 HTML 字符串
+        template: PushPlus 模板类型
+        mode: all / fallback，默认使用环境变量 PUSH_MODE
+        channels: 只推送这些渠道 (仍需已配置)，默认全部
 
     Returns:
-        是否推送成功
+        {渠道名: {"ok": 是否成功, "elapsed": 耗时(秒), "error": 错误信息或 None}}，
+        fallback 模式下只包含实际尝试过的渠道
     """
-    if not WECOM_WEBHOOK:
-        return False
+    configured = get_channels()
+    channels = [c for c in configured if channels is None or c in channels]
+    if not channels:
+        if not configured:
+            print("未配置任何推送方式")
+        return {}
+
+    mode = (mode or PUSH_MODE).lower()
+    report = {}
+    # 超时的渠道线程无法强制结束，不等待它们
+    executor = ThreadPoolExecutor(max_workers=len(channels))
+    try:
+        if mode == "fallback":
+            for channel in channels:
+                future = executor.submit(_deliver, channel, title, content, template)
+                timeout = get_push_timeout(channel)
+                try:
+                    report[channel] = future.result(timeout=timeout)
+                except FutureTimeoutError:
+                    report[channel] = _timeout_report(channel, timeout)
+                if report[channel]["ok"]:
+                    break
+        else:
+            started = time.monotonic()
+            futures = {
+                channel: executor.submit(_deliver, channel, title, content, template)
+                for channel in channels
+            }
+            for channel, future in futures.items():
+                timeout = get_push_timeout(channel)
+                remaining = max(0, timeout - (time.monotonic() - started))
+                try:
+                    report[channel] = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    report[channel] = _timeout_report(channel, timeout)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return report
+
+
+def _settle(report_id: str, targets: list, report: dict) -> int:
+    """按推送结果更新 outbox 记录，返回送达的记录数"""
+    done = 0
+    for target in targets:
+        results = {channel: result for channel, result in report.items()
+                   if target in (channel, outbox.ANY_CHANNEL)}
+        if any(result["ok"] for result in results.values()):
+            outbox.mark_done(report_id, target)
+            done += 1
+        elif results:
+            error = "; ".join(f"{channel}: {result['error']}" for channel, result in results.items())
+            outbox.mark_failed(report_id, target, error)
+    return done
+
+
+def deliver(title: str, content, template: str = "html", mode: str = None, report_id: str = None) -> dict:
+    """
+    先写入 outbox 再推送，送达的渠道标记完成，失败的留待下次补发
 
-    # Convert HTML to Markdown
-    md_content = html_to_markdown(content)
-    message = f"## {title}\n\n{md_content}"
+    Section 列表以 JSON 保存；report_id 默认按日期和内容生成，
+    同一 report_id 已在 outbox 中时不重复推送
 
-    data = {
-        "msgtype": "markdown",
-        "markdown": {
-            "content": message
-        }
-    }
+    Returns:
+        dispatch 的推送报告
+    """
+    channels = get_channels()
+    if not channels:
+        print("未配置任何推送方式")
+        return {}
+
+    stored = content if isinstance(content, str) else render.to_json(content)
+    report_id = report_id or outbox.make_report_id(title, stored)
+    mode = (mode or PUSH_MODE).lower()
+    targets = [outbox.ANY_CHANNEL] if mode == "fallback" else channels
+    targets = outbox.enqueue(report_id, title, stored, template, targets)
+    if not targets:
+        waiting = [
+            channel for channel, state in outbox.get_states(report_id).items()
+            if state["status"] != outbox.STATUS_DONE
+        ]
+        if waiting:
+            print(f"报告 {report_id} 已在 outbox 中但尚未送达 ({', '.join(waiting)})，待补发")
+        else:
+            print(f"报告 {report_id} 已推送过，跳过")
+        return {}
 
-    try:
-        resp = requests.post(WECOM_WEBHOOK, json=data, timeout=10)
-        result = resp.json()
-        if result.get("errcode") == 0:
-            print(f"企业微信推送成功: {title}")
-            return True
+    channels = None if outbox.ANY_CHANNEL in targets else targets
+    report = dispatch(title, content, template, mode, channels)
+    _settle(report_id, targets, report)
+    return report
+
+
+def drain_outbox(limit: int = None) -> int:
+    """
+    补发 outbox 中未送达的报告
+
+    Returns:
+        补发成功的记录数
+    """
+    rows = outbox.claim(OUTBOX_BATCH if limit is None else limit)
+    reports = {}
+    for row in rows:
+        reports.setdefault(row["report_id"], (row, []))[1].append(row["channel"])
+
+    delivered = 0
+    for report_id, (row, targets) in reports.items():
+        print(f"补发报告 {report_id} -> {', '.join(targets)}")
+        title = f"{row['title']} (补发)"
+        content = model.loads(row["content"])
+        if outbox.ANY_CHANNEL in targets:
+            report = dispatch(title, content, row["template"], "fallback")
         else:
-            print(f"企业微信推送失败: {result}")
-            return False
-    except Exception as e:
-        print(f"企业微信推送异常: {e}")
+            report = dispatch(title, content, row["template"], "all", targets)
+        delivered += _settle(report_id, targets, report)
+    outbox.prune()
+    return delivered
+
+
+def _push_one(channel: str, title: str, content, template: str = "html") -> bool:
+    if channel not in get_channels():
         return False
+    return _deliver(channel, title, content, template)["ok"]
 
 
-def push_pushplus(title: str, content: str, template: str = "html") -> bool:
+def push_telegram(title: str, content) -> bool:
     """
-    PushPlus 微信推送
+    Telegram Bot 推送
 
     Args:
         title: 消息标题
-        content: 消息内容
-        template: 模板类型 (html, txt, json, markdown)
+        content: 消息内容 (HTML 字符串或 Section 列表，转换为Markdown)
 
     Returns:
         是否推送成功
     """
-    if not PUSHPLUS_TOKEN:
-        return False
+    return _push_one("telegram", title, content)
 
-    url = "http://www.pushplus.plus/send"
-    data = {
-        "token": PUSHPLUS_TOKEN,
-        "title": title,
-        "content": content,
-        "template": template
-    }
 
-    try:
-        resp = requests.post(url, json=data, timeout=10)
-        result = resp.json()
-        if result.get("code") == 200:
-            print(f"PushPlus推送成功: {title}")
-            return True
-        else:
-            print(f"PushPlus推送失败: {result}")
-            return False
-    except Exception as e:
-        print(f"PushPlus推送异常: {e}")
-        return False
+def push_wecom(title: str, content) -> bool:
+    """
+    企业微信群机器人推送
 
+    Args:
+        title: 消息标题
+        content: 消息内容 (HTML 字符串或 Section 列表，转换为Markdown)
 
-def push_wechat(title: str, content: str, template: str = "html") -> bool:
+    Returns:
+        是否推送成功
     """
-    推送消息 (优先级: Telegram > 企业微信 > PushPlus)
+    return _push_one("wecom", title, content)
+
+
+def push_pushplus(title: str, content, template: str = "html") -> bool:
+    """
+    PushPlus 微信推送
 
     Args:
         title: 消息标题
-        content: 消息内容
-        template: 模板类型
+        content: 消息内容 (HTML 字符串或 Section 列表)
+        template: 模板类型 (html, txt, json, markdown)
 
     Returns:
         是否推送成功
     """
-    # 优先使用 Telegram
-    if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-        return push_telegram(title, content)
+    return _push_one("pushplus", title, content, template)
 
-    # 企业微信
-    if WECOM_WEBHOOK:
-        return push_wecom(title, content)
 
-    # 备用 PushPlus
-    if PUSHPLUS_TOKEN:
-        return push_pushplus(title, content, template)
+def push_wechat(title: str, content, template: str = "html") -> bool:
+    """
+    推送消息 (按 PUSH_MODE 推送到所有渠道，或按 Telegram > 企业微信 > PushPlus 回退)
 
-    print("未配置任何推送方式")
-    return False
+    Args:
+        title: 消息标题
+        content: 消息内容 (HTML 字符串或 Section 列表)
+        template: 模板类型
+
+    Returns:
+        是否至少有一个渠道推送成功
+    """
+    report = dispatch(title, content, template)
+    return any(result["ok"] for result in report.values())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按主机/接口限流 (令牌桶)
+所有经过 utils.client 的请求都会先取令牌；遇到限流或风控时降速，之后随时间逐渐恢复
+"""
+
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+# 默认限流规则：{主机[/路径前缀]: (每秒请求数, 突发容量)}，按最长前缀匹配
+DEFAULT_LIMITS = {
+    "api-takumi.mihoyo.com/event/luna/sign": (1.0, 2),
+    "api-takumi.mihoyo.com/event/luna/info": (3.0, 5),
+    "api-takumi.mihoyo.com/event/bbs_sign_reward/sign": (1.0, 2),
+    "api-takumi.mihoyo.com/event/bbs_sign_reward/info": (3.0, 5),
+    "api-takumi.mihoyo.com": (5.0, 10),
+}
+
+# 未配置规则的主机使用的默认速率
+DEFAULT_RATE = float(os.environ.get("RATE_LIMIT_DEFAULT_RATE", "10"))
+DEFAULT_BURST = int(os.environ.get("RATE_LIMIT_DEFAULT_BURST", "10"))
+
+# 降速后恢复到原始速率所需的时间 (秒)
+RECOVERY_SECONDS = float(os.environ.get("RATE_LIMIT_RECOVERY", "60"))
+
+# 降速下限 (原始速率的比例)
+MIN_RATE_RATIO = 1 / 16
+
+
+def parse_limits(text: str) -> dict:
+    """
+    解析 RATE_LIMITS 环境变量
+
+    格式: "api-takumi.mihoyo.com/event/luna/sign=0.5:2,api.bgm.tv=5:5"
+    """
+    limits = {}
+    for item in text.split(","):
+        item = item.strip()
+        if "=" not in item:
+            continue
+        key, value = item.split("=", 1)
+        rate, _, burst = value.partition(":")
+        try:
+            rate, burst = float(rate), int(burst or 1)
+        except ValueError:
+            rate = 0
+        # 速率必须为正数 (0 会在计算等待时间时除零，负数会让 sleep 报错)
+        if not rate > 0:
+            print(f"忽略无效的限流配置: {item}")
+            continue
+        limits[key.strip()] = (rate, burst)
+    return limits
+
+
+LIMITS = {**DEFAULT_LIMITS, **parse_limits(os.environ.get("RATE_LIMITS", ""))}
+
+
+class TokenBucket:
+    """令牌桶，线程安全"""
+
+    def __init__(self, rate: float, burst: int):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        self.updated = now
+        # 降速后线性恢复
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * elapsed / RECOVERY_SECONDS)
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+
+    def acquire(self):
+        """取一个令牌，不足时等待"""
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self):
+        """速率减半并清空令牌"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.base_rate * MIN_RATE_RATIO, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def get_limit_key(url: str) -> str:
+    """返回 URL 匹配的限流规则，无匹配时使用主机名"""
+    parts = urlsplit(url)
+    target = parts.netloc + parts.path
+    best = parts.netloc
+    for key in LIMITS:
+        if (target == key or target.startswith(key.rstrip("/") + "/")) and len(key) > len(best):
+            best = key
+    return best
+
+
+def get_bucket(url: str) -> TokenBucket:
+    """获取 URL 对应的令牌桶"""
+    key = get_limit_key(url)
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            rate, burst = LIMITS.get(key, (DEFAULT_RATE, DEFAULT_BURST))
+            bucket = _buckets[key] = TokenBucket(rate, burst)
+    return bucket
+
+
+def acquire(url: str):
+    """请求前调用，按规则等待令牌"""
+    get_bucket(url).acquire()
+
+
+def penalize(url: str):
+    """遇到限流/风控时调用，降低对应接口的速率"""
+    bucket = get_bucket(url)
+    bucket.penalize()
+    print(f"触发限流，降低请求速率: {get_limit_key(url)} -> {bucket.rate:.2f}/s")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告渲染与分片
+把任务返回的 Section 渲染成 HTML / Markdown / JSON，
+并按渠道的消息长度上限在段落边界切成多条消息。
+旧式 HTML 字符串用一个预编译的正则一次扫描转成 Markdown
+"""
+
+import re
+import json
+from functools import lru_cache
+
+from utils.model import Item, Status
+
+# 标签 (组 1: 是否闭合, 组 2: 标签名) 或一段文本
+TOKEN_RE = re.compile(r"<(/?)([a-zA-Z]+)[^>]*>|[^<]+|<")
+
+# 段落之间以空行分隔
+BLOCK_RE = re.compile(r"\n{2,}")
+
+# 标签 -> Markdown
+MARKDOWN_TAGS = {"b": "**", "strong": "**", "br": "\n"}
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+# 渠道: (标题格式, 长度上限, 长度计算方式)，上限为 None 表示不分片
+CHANNEL_FORMATS = {
+    # Telegram sendMessage 文本上限 4096 个 UTF-16 码元 (emoji 等占 2 个)
+    "telegram": ("*{title}*\n\n", 4096, _utf16_len),
+    # 企业微信 markdown 消息上限 4096 字节 (UTF-8)
+    "wecom": ("## {title}\n\n", 4096, _utf8_len),
+}
+
+
+def _item_body(item: Item, bold: tuple) -> str:
+    """加粗的 label + text"""
+    if not item.label:
+        return item.text
+    label = f"{bold[0]}{item.label}{bold[1]}"
+    return f"{label} {item.text}" if item.text else label
+
+
+def _render_item(item: Item, markdown: bool) -> str:
+    bold = ("**", "**") if markdown else ("<b>", "</b>")
+    if item.kind == Item.BLANK:
+        return ""
+    if item.kind == Item.HEADING:
+        return f"{bold[0]}{_item_body(item, ('', ''))}{bold[1]}"
+    body = _item_body(item, bold)
+    if item.kind == Item.BULLET:
+        return f"• {body}"
+    if item.kind == Item.DETAIL:
+        return f"  {body}"
+    if item.kind == Item.NOTE and not markdown:
+        return f"<small>{body}</small>"
+    return body
+
+
+def _section_lines(section, markdown: bool) -> list:
+    """段落标题、状态和各行 (执行成功但没有内容的段落返回空列表)"""
+    if section.empty:
+        return []
+    bold = ("**", "**") if markdown else ("<b>", "</b>")
+    lines = [f"{bold[0]}【{section.title}】{bold[1]}"]
+    if section.status.code == Status.TIMEOUT:
+        lines.append(f"执行超时 ({section.status.detail:.0f}s)")
+    elif section.status.code == Status.ERROR:
+        lines.append(f"执行异常: {section.status.detail}")
+    lines.extend(_render_item(item, markdown) for item in section.items)
+    return lines
+
+
+def to_html(sections: list) -> str:
+    """渲染成 HTML (<b>、<small>，以 <br> 换行)"""
+    lines = []
+    for section in sections:
+        section_lines = _section_lines(section, markdown=False)
+        if section_lines:
+            lines.extend(section_lines)
+            lines.append("")
+    return "<br>".join(lines)
+
+
+def section_markdown(section) -> str:
+    """单个段落的 Markdown"""
+    return "\n".join(_section_lines(section, markdown=True))
+
+
+def to_markdown(sections: list) -> str:
+    """渲染成 Markdown，段落之间空一行"""
+    return "\n\n".join(block for block in map(section_markdown, sections) if block)
+
+
+def to_json(sections: list) -> str:
+    """渲染成 JSON ({"sections": [...]}，可由 model.loads 还原)"""
+    return json.dumps({"sections": [section.to_dict() for section in sections]}, ensure_ascii=False)
+
+
+@lru_cache(maxsize=4)
+def html_to_markdown(html: str) -> str:
+    """HTML 报告转 Markdown (<b> -> **，<br> -> 换行，去掉其他标签)"""
+    parts = []
+    for match in TOKEN_RE.finditer(html):
+        tag = match.group(2)
+        if tag is None:
+            parts.append(match.group(0))
+        else:
+            parts.append(MARKDOWN_TAGS.get(tag.lower(), ""))
+    return "".join(parts)
+
+
+def _split_long(text: str, limit: int, measure) -> list:
+    """把超过上限的段落按行 (行也超长时按字符) 切开"""
+    pieces = []
+    current = ""
+    for line in text.split("\n"):
+        candidate = f"{current}\n{line}" if current else line
+        if measure(candidate) <= limit:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        current = ""
+        while measure(line) > limit:
+            # 二分找出不超过上限的最长前缀
+            lo, hi = 1, len(line)
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if measure(line[:mid]) <= limit:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            pieces.append(line[:lo])
+            line = line[lo:]
+        current = line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk(text: str, limit: int, measure=len) -> list:
+    """
+    在空行处把文本切成不超过 limit 的若干块
+
+    Args:
+        text: Markdown 文本
+        limit: 每块长度上限
+        measure: 长度计算函数 (字符数或字节数)
+    """
+    return chunk_blocks(BLOCK_RE.split(text.strip("\n")), limit, measure)
+
+
+def chunk_blocks(blocks: list, limit: int, measure=len) -> list:
+    """把若干段落尽量合并成不超过 limit 的块 (块之间空一行)，过长的段落再按行切开"""
+    chunks = []
+    current = ""
+    for block in blocks:
+        if not block:
+            continue
+        candidate = f"{current}\n\n{block}" if current else block
+        if measure(candidate) <= limit:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        if measure(block) <= limit:
+            current = block
+        else:
+            *head, current = _split_long(block, limit, measure)
+            chunks.extend(head)
+    if current:
+        chunks.append(current)
+    return chunks or [""]
+
+
+def render_messages(channel: str, title: str, content) -> list:
+    """
+    按渠道渲染报告，返回要依次发送的消息列表
+
+    Args:
+        channel: 渠道名 (见 CHANNEL_FORMATS)
+        title: 报告标题
+        content: Section 列表，或旧式 HTML 字符串
+
+    每条消息都带标题，分成多条时标题后加 (序号/总数)
+    """
+    header_format, limit, measure = CHANNEL_FORMATS[channel]
+    if isinstance(content, str):
+        blocks = BLOCK_RE.split(html_to_markdown(content).strip("\n"))
+    else:
+        blocks = [block for block in map(section_markdown, content) if block]
+
+    # 为 " (99/99)" 预留标题长度
+    reserve = measure(header_format.format(title=f"{title} (99/99)"))
+    bodies = chunk_blocks(blocks, limit - reserve, measure)
+    if len(bodies) == 1:
+        return [header_format.format(title=title) + bodies[0]]
+    return [
+        header_format.format(title=f"{title} ({i}/{len(bodies)})") + body
+        for i, body in enumerate(bodies, 1)
+    ]
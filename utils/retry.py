@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重试策略与熔断器
+网络错误和 5xx 按指数退避 + 随机抖动重试；同一接口连续失败后熔断，本次运行内快速失败
+"""
+
+import os
+import random
+import threading
+import time
+
+from utils import metrics
+
+# 每个请求的最大尝试次数 (含首次)
+MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", "3"))
+
+# 退避基数与上限 (秒)
+BASE_DELAY = float(os.environ.get("RETRY_BASE_DELAY", "0.5"))
+MAX_DELAY = float(os.environ.get("RETRY_MAX_DELAY", "8"))
+
+# 连续失败多少次后熔断
+BREAKER_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", "3"))
+
+# 熔断后多久允许一次试探请求 (秒)，默认覆盖整个运行
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", "600"))
+
+
+class CircuitOpenError(Exception):
+    """接口已熔断"""
+
+
+def backoff_delay(attempt: int) -> float:
+    """第 attempt 次重试前的等待时间 (full jitter)"""
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+
+
+def is_retryable_status(status_code: int) -> bool:
+    """5xx 和 429 可以重试"""
+    return status_code >= 500 or status_code == 429
+
+
+class CircuitBreaker:
+    """单个接口的熔断器，线程安全"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否允许发送请求 (熔断冷却结束后放行一次试探)"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= BREAKER_COOLDOWN:
+                # 半开：放行一次，失败则重新计时
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= BREAKER_THRESHOLD:
+                if self.opened_at is None:
+                    print(f"接口连续失败 {self.failures} 次，已熔断: {self.name}")
+                self.opened_at = time.monotonic()
+
+
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """获取 URL 对应接口 (主机 + 路径) 的熔断器，路径中的 bot token 已脱敏"""
+    key = "".join(metrics.get_endpoint(url))
+    with _lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(key)
+    return breaker
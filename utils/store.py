@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地缓存目录与 JSON 读写
+"""
+
+import os
+import json
+import tempfile
+
+# 缓存根目录 (GitHub Actions 中通过 actions/cache 跨运行保留)
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache")
+
+
+def cache_path(*parts: str) -> str:
+    """返回缓存目录下的文件路径，并确保父目录存在"""
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def load_json(path: str, default=None):
+    """读取 JSON 文件，不存在或损坏时返回 default"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path: str, data) -> bool:
+    """原子写入 JSON 文件 (先写临时文件再替换)"""
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"写入缓存异常: {e}")
+        return False
+
+
+def remove(path: str):
+    """删除缓存文件，不存在时忽略"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass